@@ -0,0 +1,212 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+from treys import Deck, Evaluator
+
+import equity_cache
+from evaluator import SevenCardEvaluator
+from game import PokerHand
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+
+# A metric regresses when it is this much worse than the baseline
+DEFAULT_THRESHOLD = 0.10
+
+PLAYER_COUNTS = (2, 3, 6, 10)
+STREET_BOARDS = (('preflop', 0), ('flop', 3), ('turn', 4), ('river', 5))
+
+
+def _metric(value, unit, higher_is_better):
+    return {'value': value, 'unit': unit, 'higher_is_better': higher_is_better}
+
+
+def _best_of(repeats, work):
+    """Fastest of `repeats` timed calls of work(), in seconds; the minimum is least noisy"""
+    timings = []
+    # As in timeit, garbage collection is kept out of the measurement
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeats):
+            started = time.perf_counter()
+            work()
+            timings.append(time.perf_counter() - started)
+    finally:
+        if enabled:
+            gc.enable()
+    return min(timings)
+
+
+def bench_evaluators(hands=20000, repeats=3, seed=0):
+    """Evaluations per second for 5, 6 and 7 cards, stock and single-pass"""
+    rng = random.Random(seed)
+    deck = Deck.GetFullDeck()
+    samples = [rng.sample(deck, 7) for _ in range(hands)]
+    results = {}
+    for evaluator in (Evaluator(), SevenCardEvaluator()):
+        name = type(evaluator).__name__
+        for size in (5, 6, 7):
+            boards = [cards[2:size] for cards in samples]
+
+            def evaluate_all():
+                for cards, board in zip(samples, boards):
+                    evaluator.evaluate(cards[:2], board)
+
+            results[f'evaluate.{name}.{size}_cards'] = _metric(
+                hands / _best_of(repeats, evaluate_all), 'evals/s', True)
+
+    # Batch ranking: 10 hands against boards drawn from the other 32 cards
+    evaluator = SevenCardEvaluator()
+    shuffled = rng.sample(deck, 52)
+    hand_cards = [shuffled[i:i + 2] for i in range(0, 20, 2)]
+    boards = [rng.sample(shuffled[20:], 5) for _ in range(hands // 10)]
+    elapsed = _best_of(repeats, lambda: evaluator.evaluate_many(hand_cards, boards))
+    results['evaluate_many.7_cards'] = _metric(len(hand_cards) * len(boards) / elapsed, 'evals/s', True)
+    return results
+
+
+def _spots(players, board_size, count, rng):
+    """Random (hands, board) spots for a player count and board size"""
+    spots = []
+    for _ in range(count):
+        hand = PokerHand(players, rng=rng)
+        hand.new_hand()
+        hand.deal_cards()
+        while len(hand.community_cards) < board_size:
+            hand.deal_street()
+        spots.append((hand.player_cards, hand.community_cards))
+    return spots
+
+
+def _solve_fresh(hands, board):
+    """estimate_equity on a new PokerHand with a private cache, so nothing is reused"""
+    hand = PokerHand(cache=equity_cache.EquityCache())
+    hand.load_position(hands, board)
+    hand.estimate_equity()
+
+
+def bench_equity(spots=5, repeats=3, seed=0):
+    """Median over random spots of the best estimate_equity latency, per street and player count"""
+    rng = random.Random(seed)
+    results = {}
+    for street, board_size in STREET_BOARDS:
+        for players in PLAYER_COUNTS:
+            cell = _spots(players, board_size, spots, rng)
+            _solve_fresh(*cell[0])  # Warm up first-call costs outside the timing
+            timings = [_best_of(repeats, lambda: _solve_fresh(hands, board)) for hands, board in cell]
+            results[f'equity.{street}.{players}_players'] = _metric(statistics.median(timings) * 1000, 'ms', False)
+    return results
+
+
+def bench_cold_start(repeats=3):
+    """Seconds for a fresh interpreter to import poker and build a PokerGame"""
+    code = "import time; t = time.perf_counter(); import poker; poker.PokerGame(); print(time.perf_counter() - t)"
+    here = os.path.dirname(os.path.abspath(__file__))
+    timings = [
+        float(subprocess.run([sys.executable, '-c', code], cwd=here, capture_output=True, text=True,
+                             check=True).stdout)
+        for _ in range(repeats)
+    ]
+    return {'poker_game.cold_start': _metric(min(timings) * 1000, 'ms', False)}
+
+
+def bench_dealing(hands=20000, repeats=3, seed=0):
+    """Complete deals per second and formatted cards per second"""
+    import poker
+
+    game = PokerHand(6, rng=random.Random(seed))
+
+    def deal_all():
+        for _ in range(hands):
+            game.new_hand()
+            game.deal_cards()
+            for _ in range(3):
+                game.deal_street()
+
+    terminal = poker.PokerGame()
+    cards = Deck.GetFullDeck() * 100
+
+    def format_all():
+        for card in cards:
+            terminal.format_card(card)
+
+    return {
+        'deal.hands': _metric(hands / _best_of(repeats, deal_all), 'hands/s', True),
+        'format_card': _metric(len(cards) / _best_of(repeats, format_all), 'cards/s', True),
+    }
+
+
+def run_all(quick=False):
+    """Every benchmark's metrics, keyed by name"""
+    repeats = 1 if quick else 3
+    results = {}
+    results.update(bench_evaluators(5000 if quick else 20000, repeats))
+    results.update(bench_equity(2 if quick else 5, repeats))
+    results.update(bench_cold_start(repeats))
+    results.update(bench_dealing(5000 if quick else 20000, repeats))
+    return results
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """(name, change, regressed) for metrics in both runs; change > 0 is better"""
+    rows = []
+    for name, metric in results.items():
+        if name not in baseline:
+            continue
+        before, after = baseline[name]['value'], metric['value']
+        change = (after - before) / before if metric['higher_is_better'] else (before - after) / before
+        rows.append((name, change, change < -threshold))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark evaluation, equity and game hot paths")
+    parser.add_argument('--output', default=None, help="write results as JSON to this file")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="baseline JSON to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="store this run as the baseline")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="fractional slowdown that counts as a regression")
+    parser.add_argument('--quick', action='store_true', help="fewer repetitions, noisier numbers")
+    args = parser.parse_args(argv)
+
+    results = run_all(args.quick)
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'numpy': np.__version__,
+        'results': results,
+    }
+    for name, metric in results.items():
+        print(f"{name:<40} {metric['value']:>14,.2f} {metric['unit']}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    status = 0
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        print(f"\nCompared with {args.baseline} (threshold {args.threshold:.0%}):")
+        for name, change, regressed in compare(results, baseline, args.threshold):
+            print(f"  {name:<40} {change:>+8.1%}{'  REGRESSION' if regressed else ''}")
+            if regressed:
+                status = 1
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved baseline to {args.baseline}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+from itertools import combinations, permutations
+
+from treys import Card
+
+from cards import CARD_INDEX, CARD_INTS, cards_mask
+
+# Each suit permutation as a relabeling table over dense card indices
+SUIT_RELABELINGS = [
+    tuple((card // 4) * 4 + perm[card % 4] for card in range(52))
+    for perm in permutations(range(4))
+]
+IDENTITY = SUIT_RELABELINGS[0]
+
+
+def _dense(cards):
+    """Dense indices of treys cards"""
+    return [CARD_INDEX[card] for card in cards]
+
+
+def _relabel(cards, table):
+    """Sorted tuple of dense cards after a suit relabeling"""
+    return tuple(sorted(table[card] for card in cards))
+
+
+def canonical_form(hands, board):
+    """Dense (hands, board) form shared by every suit-isomorphic spot
+
+    Seats keep their order; cards within a hand and on the board do not.
+    """
+    dense_hands = [_dense(hand) for hand in hands]
+    dense_board = _dense(board)
+    best = None
+    for table in SUIT_RELABELINGS:
+        form = (tuple(_relabel(hand, table) for hand in dense_hands), _relabel(dense_board, table))
+        if best is None or form < best:
+            best = form
+    return best
+
+
+def _cards_text(cards):
+    """Dense cards as concatenated treys strings"""
+    return ''.join(Card.int_to_str(CARD_INTS[card]) for card in cards)
+
+
+def form_key(form):
+    """Stable, readable key for a canonical form, e.g. 'KsAs QhQd|2s7c9h'"""
+    hands, board = form
+    return ' '.join(_cards_text(hand) for hand in hands) + '|' + _cards_text(board)
+
+
+def canonicalize(hands, board):
+    """Suit-relabeled treys hands and board plus their stable key"""
+    form = canonical_form(hands, board)
+    canon_hands = [[CARD_INTS[card] for card in hand] for hand in form[0]]
+    canon_board = [CARD_INTS[card] for card in form[1]]
+    return canon_hands, canon_board, form_key(form)
+
+
+def stabilizer(hands, board):
+    """Suit relabelings that map every hand and the board onto themselves"""
+    card_sets = [frozenset(_dense(hand)) for hand in hands] + [frozenset(_dense(board))]
+    return [
+        table for table in SUIT_RELABELINGS
+        if all(frozenset(table[card] for card in cards) == cards for cards in card_sets)
+    ]
+
+
+def weighted_runouts(hands, board):
+    """Yield (runout, weight) with one runout per suit-symmetric class
+
+    The weight is the number of runouts in the class, so the weights add up
+    to the number of plain runouts and every class has the same equity.
+    """
+    needed = 5 - len(board)
+    dead = cards_mask(board)
+    for hand in hands:
+        dead |= cards_mask(hand)
+    live = [card for card in range(52) if not dead >> card & 1]
+    group = [table for table in stabilizer(hands, board) if table != IDENTITY]
+
+    for runout in combinations(live, needed):
+        orbit = {runout}
+        for table in group:
+            image = _relabel(runout, table)
+            # Only the smallest runout of its class is evaluated
+            if image < runout:
+                break
+            orbit.add(image)
+        else:
+            yield [CARD_INTS[card] for card in runout], len(orbit)
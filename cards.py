@@ -0,0 +1,70 @@
+import numpy as np
+from treys import Card, Deck
+
+# Dense card index 0-51: rank * 4 + suit, in the treys rank order. It is
+# also the order of Deck.GetFullDeck(), so index order is deck order.
+SUIT_INDEX = {1: 0, 2: 1, 4: 2, 8: 3}
+CARD_INTS = sorted(Deck.GetFullDeck(), key=lambda c: (Card.get_rank_int(c), SUIT_INDEX[Card.get_suit_int(c)]))
+CARD_INDEX = {card: i for i, card in enumerate(CARD_INTS)}
+CARD_INT_ARRAY = np.array(CARD_INTS, dtype=np.int64)
+
+# A treys int's rank nibble (bits 8-11) and suit nibble (bits 12-15) pick its
+# dense index from this table, so arrays of any shape convert in one lookup
+FIELD_INDEX = np.full(256, -1, dtype=np.intp)
+FIELD_INDEX[(CARD_INT_ARRAY >> 8) & 0xFF] = np.arange(52)
+
+# Card masks: bit i stands for dense card i. CARD_BITS holds uint64 bits
+# for array code, CARD_MASKS Python int bits keyed by treys int.
+CARD_BITS = np.uint64(1) << np.arange(52, dtype=np.uint64)
+CARD_MASKS = {card: 1 << i for i, card in enumerate(CARD_INTS)}
+FULL_DECK = (1 << 52) - 1
+
+
+def card_indices(cards):
+    """Dense indices for treys card ints, a list or an array of any shape"""
+    return FIELD_INDEX[(np.asarray(cards, dtype=np.int64) >> 8) & 0xFF]
+
+
+def card_ints(indices):
+    """Treys card ints for dense indices, a list or an array of any shape"""
+    return CARD_INT_ARRAY[np.asarray(indices, dtype=np.intp)]
+
+
+def cards_mask(cards):
+    """Mask of treys cards, as a Python int"""
+    mask = 0
+    for card in cards:
+        mask |= CARD_MASKS[card]
+    return mask
+
+
+def indices_mask(indices):
+    """Mask of dense card indices, as a Python int"""
+    mask = 0
+    for index in indices:
+        mask |= 1 << int(index)
+    return mask
+
+
+def row_masks(indices):
+    """uint64 mask of each row of an (N, k) array of dense indices"""
+    indices = np.asarray(indices, dtype=np.intp)
+    masks = np.zeros(indices.shape[:-1], dtype=np.uint64)
+    for column in np.moveaxis(indices, -1, 0):
+        masks |= CARD_BITS[column]
+    return masks
+
+
+def mask_indices(mask):
+    """Dense indices of the cards in a mask, ascending"""
+    return np.flatnonzero(np.uint64(mask) & CARD_BITS)
+
+
+def mask_cards(mask):
+    """Treys ints of the cards in a mask, in deck order"""
+    return [card for card, bit in CARD_MASKS.items() if mask & bit]
+
+
+def live_indices(dead_mask):
+    """Dense indices of the cards not in dead_mask"""
+    return mask_indices(FULL_DECK & ~dead_mask)
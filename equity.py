@@ -0,0 +1,309 @@
+import time
+from itertools import combinations
+from math import comb
+
+import numpy as np
+
+from canonical import weighted_runouts
+from cards import card_indices, cards_mask, live_indices, row_masks
+from evaluator import NO_FLUSH, evaluate_showdowns
+
+# Each pot is split into this many units so that ties between up to 10
+# players (lcm of 1..10) stay integral and separate runs add up exactly.
+POT_UNITS = 2520
+
+DEFAULT_SIMULATIONS = 10000
+
+# Runouts sampled and evaluated together by the NumPy backend
+BATCH_SIZE = 10000
+
+# Adaptive sampling: widest 95% interval accepted (percentage points), the
+# wall-clock budget in seconds, and the samples drawn between error checks
+DEFAULT_TOLERANCE = 1.0
+DEFAULT_TIME_BUDGET = 2.0
+ADAPTIVE_BATCH = 5000
+Z_95 = 1.96
+
+# Marks a seat's rank on a runout that holds one of its own cards
+NO_RANK = NO_FLUSH
+
+
+def runout_count(hands, board):
+    """Number of distinct boards that complete the given board"""
+    dealt = sum(len(hand) for hand in hands) + len(board)
+    return comb(52 - dealt, 5 - len(board))
+
+
+def shares_to_equity(shares, pots):
+    """Convert accumulated pot units into equity percentages"""
+    return [share / (pots * POT_UNITS) * 100 for share in shares]
+
+
+class EquityResult:
+    """Equity percentages for a list of hands and the work behind them"""
+
+    def __init__(self, equity, samples, stderr, exact=False):
+        self.equity = equity
+        self.samples = samples
+        self.stderr = stderr
+        self.exact = exact
+
+    def margins(self):
+        """Half-width of each hand's 95% confidence interval, in percent"""
+        return [Z_95 * se for se in self.stderr]
+
+    def interval_width(self):
+        """Width of the widest 95% confidence interval, in percent"""
+        return 2 * max(self.margins(), default=0.0)
+
+    def to_dict(self):
+        """Plain dict form for storage"""
+        return {'equity': self.equity, 'samples': self.samples, 'stderr': self.stderr, 'exact': self.exact}
+
+    @staticmethod
+    def from_dict(data):
+        """Rebuild a result stored with to_dict"""
+        return EquityResult(data['equity'], data['samples'], data['stderr'], data['exact'])
+
+
+def exact_result(shares, pots):
+    """EquityResult for shares counted over every runout"""
+    return EquityResult(shares_to_equity(shares, pots), pots, [0.0] * len(shares), exact=True)
+
+
+def sampled_result(shares, squares, samples):
+    """EquityResult from per-sample pot-unit sums and sums of squares"""
+    stderr = []
+    for total, square in zip(shares, squares):
+        mean = total / samples
+        variance = max(square / samples - mean * mean, 0.0) * samples / max(samples - 1, 1)
+        stderr.append((variance / samples) ** 0.5 / POT_UNITS * 100)
+    return EquityResult(shares_to_equity(shares, samples), samples, stderr)
+
+
+def enumerate_shares(evaluator, hands, board, runouts=None, metrics=None):
+    """Pot units won by each hand over weighted runouts, and the pot count
+
+    runouts defaults to every suit-symmetric class from weighted_runouts; a
+    slice of that list gives the shares of those classes only. evaluator
+    must provide evaluate_many (see evaluator.SevenCardEvaluator).
+    metrics, if given, receives the time split through record_work.
+    """
+    started = time.perf_counter()
+    board = list(board)
+    # Suit-symmetric runouts are evaluated once and counted by their weight
+    if runouts is None:
+        runouts = list(weighted_runouts(hands, board))
+    if not runouts:
+        return [0] * len(hands), 0
+
+    boards = [board + runout for runout, _ in runouts]
+    weights = np.array([weight for _, weight in runouts], dtype=np.int64)
+    enumerated = time.perf_counter()
+    ranks = evaluator.evaluate_many(hands, boards)
+    evaluated = time.perf_counter()
+    won = board_shares(ranks).astype(np.int64)
+    shares = (won * weights).sum(axis=1).tolist()
+    if metrics is not None:
+        metrics.record_work(enumerated - started, evaluated - enumerated, time.perf_counter() - evaluated,
+                            samples=len(runouts), evaluations=ranks.size)
+    return shares, int(weights.sum())
+
+
+class LiveCardSampler:
+    """Draws batches of runouts from the cards that are still live on a street
+
+    Built once per street from the live dense indices and reused for every
+    batch. The counters measure sampling throughput on its own.
+    """
+
+    def __init__(self, live, rng=None):
+        self.live = np.asarray(live, dtype=np.intp)
+        self.rng = rng or np.random.default_rng()
+        self.reset_counters()
+
+    def reset_counters(self):
+        """Restart the throughput counters"""
+        self.samples = 0
+        self.cards_drawn = 0
+        self.seconds = 0.0
+
+    def sample(self, needed, count):
+        """(count, needed) distinct live cards per row, by a partial Fisher-Yates shuffle"""
+        started = time.perf_counter()
+        decks = np.tile(self.live, (count, 1))
+        rows = np.arange(count)
+        # Each row stays a permutation of the live cards, so only the first
+        # `needed` positions are ever shuffled
+        for i in range(needed):
+            j = self.rng.integers(i, len(self.live), count)
+            picked = decks[rows, j]
+            decks[rows, j] = decks[:, i]
+            decks[:, i] = picked
+        self.samples += count
+        self.cards_drawn += count * needed
+        self.seconds += time.perf_counter() - started
+        return decks[:, :needed]
+
+    def samples_per_second(self):
+        """Runouts drawn per second of sampling since the counters were last reset"""
+        return self.samples / self.seconds if self.seconds > 0 else 0.0
+
+
+def board_shares(ranks):
+    """Pot units won by each player on each board of a (players, boards) rank matrix"""
+    winners = ranks == ranks.min(axis=0)
+    return winners * (POT_UNITS // winners.sum(axis=0))
+
+
+def vectorized_shares(hands, board, simulations, rng, batch_size=BATCH_SIZE, metrics=None, sampler=None):
+    """Pot units won by each hand over `simulations` sampled runouts, and their squares
+
+    sampler is a LiveCardSampler for this street (built from rng if not
+    given). metrics, if given, receives the time split through record_work.
+    """
+    timings = [0.0, 0.0, 0.0]  # sampling, evaluation, bookkeeping
+    started = time.perf_counter()
+    board = list(board)
+    needed = 5 - len(board)
+    hand_indices = np.array([card_indices(hand) for hand in hands])
+    board_indices = card_indices(board)
+    if sampler is None:
+        sampler = LiveCardSampler(live_indices(cards_mask([card for hand in hands for card in hand] + board)), rng)
+
+    shares = np.zeros(len(hands), dtype=np.int64)
+    squares = np.zeros(len(hands), dtype=np.int64)
+    done = 0
+    while done < simulations:
+        count = min(batch_size, simulations - done)
+        runouts = sampler.sample(needed, count)
+        boards = np.hstack([np.broadcast_to(board_indices, (count, len(board))), runouts])
+        sampled = time.perf_counter()
+        ranks = evaluate_showdowns(hand_indices, boards)
+        evaluated = time.perf_counter()
+        won = board_shares(ranks).astype(np.int64)
+        shares += won.sum(axis=1)
+        squares += (won * won).sum(axis=1)
+        done += count
+        finished = time.perf_counter()
+        timings[0] += sampled - started
+        timings[1] += evaluated - sampled
+        timings[2] += finished - evaluated
+        started = finished
+
+    if metrics is not None:
+        metrics.record_work(*timings, samples=simulations, evaluations=simulations * len(hands))
+    return shares.tolist(), squares.tolist()
+
+
+def iter_adaptive_equity(hands, board, tolerance=DEFAULT_TOLERANCE, time_budget=DEFAULT_TIME_BUDGET,
+                         rng=None, batch_size=ADAPTIVE_BATCH, cancel=None, metrics=None):
+    """Yield a refined EquityResult after every batch of adaptive sampling
+
+    Runs until every 95% interval is narrower than tolerance, time_budget
+    seconds have passed (None for no limit) or the optional threading.Event
+    cancel is set. Consumers may also stop early and keep the last result.
+    """
+    sampler = LiveCardSampler(live_indices(cards_mask([card for hand in hands for card in hand] + list(board))), rng)
+    deadline = time.perf_counter() + time_budget if time_budget else None
+    shares = [0] * len(hands)
+    squares = [0] * len(hands)
+    samples = 0
+
+    while True:
+        batch_shares, batch_squares = vectorized_shares(hands, board, batch_size, sampler.rng, metrics=metrics,
+                                                        sampler=sampler)
+        shares = [a + b for a, b in zip(shares, batch_shares)]
+        squares = [a + b for a, b in zip(squares, batch_squares)]
+        samples += batch_size
+
+        result = sampled_result(shares, squares, samples)
+        yield result
+        if result.interval_width() <= tolerance:
+            return
+        if deadline is not None and time.perf_counter() >= deadline:
+            return
+        if cancel is not None and cancel.is_set():
+            return
+
+
+def iter_equity(evaluator, hands, board, tolerance=DEFAULT_TOLERANCE, time_budget=DEFAULT_TIME_BUDGET,
+                rng=None, cancel=None, metrics=None):
+    """Yield successively refined EquityResults; the last is solve_equity's answer
+
+    Enumerated spots yield one exact result, sampled spots one per batch.
+    """
+    if runout_count(hands, board) <= DEFAULT_SIMULATIONS:
+        yield exact_result(*enumerate_shares(evaluator, hands, board, metrics=metrics))
+        return
+    yield from iter_adaptive_equity(hands, board, tolerance, time_budget, rng, cancel=cancel, metrics=metrics)
+
+
+def solve_equity(evaluator, hands, board, tolerance=DEFAULT_TOLERANCE, time_budget=DEFAULT_TIME_BUDGET,
+                 rng=None, cancel=None, metrics=None):
+    """EquityResult for each hand, enumerating when that is cheaper than sampling"""
+    for result in iter_equity(evaluator, hands, board, tolerance, time_budget, rng, cancel, metrics):
+        pass
+    return result
+
+
+class EquitySession:
+    """Exact equity for one hand that reuses work across streets and folds
+
+    The first query with a board of 3 or more cards ranks every seat on every
+    runout of the cards not on that board. Later queries for any subset of
+    seats on that board or a board extending it (the turn and river that
+    actually fell) select their runouts from the stored ranks instead of
+    evaluating again. Runouts holding a seat's own cards are stored but only
+    count while that seat is still in the hand, so folded cards return to
+    the deck exactly as in enumerate_shares.
+    """
+
+    def __init__(self, hands):
+        self.hands = np.array([card_indices(hand) for hand in hands])
+        self.hand_masks = row_masks(self.hands)
+        self.board = None  # mask of the enumerated board
+        self.runout_masks = None
+        self.ranks = None
+
+    def covers(self, board):
+        """Whether a query on this board can be answered from stored ranks"""
+        return self.board is not None and not self.board & ~cards_mask(board) and len(board) <= 5
+
+    def _enumerate(self, board, metrics=None):
+        """Rank every seat on every runout of the cards not on board"""
+        started = time.perf_counter()
+        self.board = cards_mask(board)
+        on_board = card_indices(board)
+        live = live_indices(self.board)
+        # Only the masks are kept; the runout cards are needed just to rank them
+        runouts = live[np.array(list(combinations(range(len(live)), 5 - len(board))), dtype=np.intp)]
+        self.runout_masks = row_masks(runouts)
+        boards = np.hstack([np.broadcast_to(on_board, (len(runouts), len(board))), runouts])
+
+        # Seats are never ranked on runouts holding their own cards
+        enumerated = time.perf_counter()
+        self.ranks = np.full((len(self.hands), len(runouts)), NO_RANK, dtype=np.uint16)
+        for seat, (hand, hand_mask) in enumerate(zip(self.hands, self.hand_masks)):
+            valid = (self.runout_masks & hand_mask) == 0
+            self.ranks[seat, valid] = evaluate_showdowns(hand[None, :], boards[valid])[0]
+        if metrics is not None:
+            metrics.record_work(enumerated - started, time.perf_counter() - enumerated,
+                                samples=len(runouts), evaluations=int((self.ranks != NO_RANK).sum()))
+
+    def solve_equity(self, board, seats, metrics=None):
+        """Exact EquityResult for the given seats on board"""
+        if not self.covers(board):
+            self._enumerate(board, metrics)
+        started = time.perf_counter()
+
+        # Runouts that deal the newer board cards and none of the seats' cards
+        newer = np.uint64(cards_mask(board) & ~self.board)
+        selected = (self.runout_masks & newer) == newer
+        ranks = self.ranks[seats][:, selected]
+        ranks = ranks[:, (ranks != NO_RANK).all(axis=0)]
+
+        shares = board_shares(ranks).sum(axis=1)
+        if metrics is not None:
+            metrics.record_work(bookkeeping=time.perf_counter() - started)
+        return exact_result(shares.tolist(), ranks.shape[1])
@@ -0,0 +1,100 @@
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from canonical import canonicalize
+from equity import DEFAULT_TOLERANCE, EquityResult
+
+DEFAULT_CACHE_SIZE = 4096
+
+
+class EquityCache:
+    """Bounded LRU cache of EquityResults keyed on canonical situations
+
+    Keys come from the suit-canonical form of the active hands and board, so
+    isomorphic spots share an entry and folded seats are simply left out.
+    With a path, exact entries are also written to a SQLite file that other
+    games and processes can read; the in-memory tier stays bounded either
+    way. A sampled entry only answers lookups whose tolerance it meets.
+    """
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE, path=None):
+        self.maxsize = maxsize
+        self.path = path
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.db = None
+        if path:
+            self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("CREATE TABLE IF NOT EXISTS equity (key TEXT PRIMARY KEY, result TEXT NOT NULL)")
+            self.db.commit()
+
+    @staticmethod
+    def situation_key(hands, board):
+        """Cache key for the active hands (in seat order) and the board"""
+        return canonicalize(hands, board)[2]
+
+    def get(self, key, tolerance=DEFAULT_TOLERANCE):
+        """Cached EquityResult for key whose 95% interval fits tolerance, or None"""
+        with self.lock:
+            result = self.entries.get(key)
+            if result is not None and result.interval_width() <= tolerance:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return result
+
+            if self.db is not None:
+                row = self.db.execute("SELECT result FROM equity WHERE key = ?", (key,)).fetchone()
+                if row:
+                    result = EquityResult.from_dict(json.loads(row[0]))
+                    self._remember(key, result)
+                    self.disk_hits += 1
+                    return result
+
+            self.misses += 1
+            return None
+
+    def put(self, key, result):
+        """Store a result in memory and, if it is exact and a path is configured, on disk"""
+        with self.lock:
+            self._remember(key, result)
+            if self.db is not None and result.exact:
+                self.db.execute("INSERT OR REPLACE INTO equity (key, result) VALUES (?, ?)",
+                                (key, json.dumps(result.to_dict())))
+                self.db.commit()
+
+    def _remember(self, key, result):
+        """Insert into the LRU tier, evicting the least recently used entries"""
+        self.entries[key] = result
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        """Hit-rate and eviction counters"""
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            'size': len(self.entries),
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+    def close(self):
+        """Close the on-disk tier"""
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+
+# In-memory cache shared by every game in the process
+shared_cache = EquityCache()
@@ -0,0 +1,416 @@
+import mmap
+import os
+import random
+import struct
+import time
+from collections import Counter
+from itertools import combinations_with_replacement
+
+import numpy as np
+from treys import Card, Deck, Evaluator
+from treys.lookup import LookupTable
+
+from cards import CARD_INTS, card_indices
+
+# Per-rank keys whose sums are unique for every multiset of 7 ranks with at
+# most 4 cards of a rank, so a hand's rank histogram hashes to a table slot
+RANK_KEYS = [0, 1, 5, 22, 98, 453, 2031, 8698, 22854, 83661, 262349, 636345, 1479181]
+
+# Non-flush 6- and 7-card hands use a perfect hash of their key sum: h is the
+# sum times a multiplier mod 2**32, its top bits pick a bucket, and the slot is
+# its low bits plus that bucket's displacement. (slot bits, bucket bits) per size.
+HASH_BITS = {6: (15, 13), 7: (16, 14)}
+
+# Sentinel for suits that hold fewer than 5 cards; worse than any real hand
+NO_FLUSH = LookupTable.MAX_HIGH_CARD + 1
+
+TABLES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lookup_tables.bin')
+
+# The tables file is a header (magic, version, one length per section)
+# followed by each section's flat array, padded to 8-byte boundaries
+TABLES_MAGIC = b'EKLT'
+TABLES_VERSION = 2
+TABLE_SECTIONS = [
+    ('flush', '<u2'),        # best flush, indexed by 13 suited rank bits
+    ('keys5', '<u4'),        # sorted RANK_KEYS sums of 5-card rank multisets
+    ('ranks5', '<u2'),       # their ranks
+    ('multipliers', '<u4'),  # hash multiplier for 6 and 7 cards
+    ('displace6', '<u2'),    # per-bucket slot displacement, 6 cards
+    ('ranks6', '<u2'),       # best non-flush hand by hash slot, 6 cards
+    ('displace7', '<u2'),
+    ('ranks7', '<u2'),
+]
+
+# Per-card contributions: rank key, and a rank bit in the card's suit column
+CARD_KEYS = np.array([RANK_KEYS[i // 4] for i in range(52)], dtype=np.int64)
+CARD_SUIT_BITS = np.zeros((52, 4), dtype=np.int64)
+CARD_SUIT_BITS[np.arange(52), np.arange(52) % 4] = 1 << (np.arange(52) // 4)
+
+_tables = None
+
+
+def _rank_multisets(size):
+    """Every multiset of `size` ranks with at most 4 cards of any rank"""
+    for ranks in combinations_with_replacement(range(13), size):
+        if max(Counter(ranks).values()) <= 4:
+            yield ranks
+
+
+def _perfect_hash(keys, slot_bits, bucket_bits, seed=0):
+    """(multiplier, displacements, slot of each key) for a collision-free HASH_BITS hash"""
+    keys = np.asarray(keys, dtype=np.uint32)
+    slot_mask = (1 << slot_bits) - 1
+    rng = np.random.default_rng(seed)
+    # Keys sharing a bucket move together, so they must differ in their low bits
+    while True:
+        multiplier = np.uint32(rng.integers(1 << 31) * 2 + 1)
+        hashed = keys * multiplier
+        buckets = hashed >> np.uint32(32 - bucket_bits)
+        low = (hashed & np.uint32(slot_mask)).astype(np.int64)
+        if len(np.unique(buckets.astype(np.int64) << slot_bits | low)) == len(keys):
+            break
+
+    # Place the fullest buckets first, each at the smallest displacement that fits
+    order = np.argsort(buckets, kind='stable')
+    starts = np.searchsorted(buckets[order], np.arange((1 << bucket_bits) + 1))
+    free = np.ones(1 << slot_bits, dtype=bool)
+    displacements = np.zeros(1 << bucket_bits, dtype='<u2')
+    slots = np.empty(len(keys), dtype=np.int64)
+    for bucket in np.argsort(starts[:-1] - starts[1:], kind='stable'):
+        members = order[starts[bucket]:starts[bucket + 1]]
+        if not len(members):
+            break
+        for first in range(0, 1 << slot_bits, 4096):
+            candidates = (low[members, None] + np.arange(first, first + 4096)) & slot_mask
+            fits = free[candidates].all(axis=0)
+            if fits.any():
+                break
+        else:
+            raise ValueError("No displacement fits; the hash needs more slots")
+        column = int(np.argmax(fits))
+        displacements[bucket] = first + column
+        slots[members] = candidates[:, column]
+        free[slots[members]] = False
+    return int(multiplier), displacements, slots
+
+
+def _build_tables():
+    """Compute the flat evaluation tables from the treys LookupTable"""
+    lookup = LookupTable()
+    tables = {}
+
+    # Flushes: best 5-card flush for every 13-bit set of suited ranks
+    flush = np.full(1 << 13, NO_FLUSH, dtype='<u2')
+    for bits in sorted(range(1 << 13), key=lambda b: bin(b).count('1')):
+        count = bin(bits).count('1')
+        if count == 5:
+            flush[bits] = lookup.flush_lookup[Card.prime_product_from_rankbits(bits)]
+        elif count > 5:
+            flush[bits] = min(flush[bits & ~(1 << r)] for r in range(13) if bits & (1 << r))
+    tables['flush'] = flush
+
+    # Everything else: best 5 of n ranks, keyed by the sum of RANK_KEYS
+    best = {}
+    for ranks in _rank_multisets(5):
+        product = 1
+        for r in ranks:
+            product *= Card.PRIMES[r]
+        best[ranks] = lookup.unsuited_lookup[product]
+    for size in (6, 7):
+        for ranks in _rank_multisets(size):
+            best[ranks] = min(best[ranks[:i] + ranks[i + 1:]] for i in range(size))
+
+    multisets = list(_rank_multisets(5))
+    keys = np.array([sum(RANK_KEYS[r] for r in ranks) for ranks in multisets])
+    order = np.argsort(keys)
+    tables['keys5'] = keys[order].astype('<u4')
+    tables['ranks5'] = np.array([best[ranks] for ranks in multisets], dtype='<u2')[order]
+
+    # A direct table on the 7-card sums would be 7.8M slots for 49,205 hands
+    multipliers = []
+    for size, (slot_bits, bucket_bits) in HASH_BITS.items():
+        multisets = list(_rank_multisets(size))
+        keys = [sum(RANK_KEYS[r] for r in ranks) for ranks in multisets]
+        multiplier, displacements, slots = _perfect_hash(keys, slot_bits, bucket_bits)
+        ranks = np.zeros(1 << slot_bits, dtype='<u2')
+        ranks[slots] = [best[ranks] for ranks in multisets]
+        multipliers.append(multiplier)
+        tables[f'displace{size}'] = displacements
+        tables[f'ranks{size}'] = ranks
+    tables['multipliers'] = np.array(multipliers, dtype='<u4')
+
+    return tables
+
+
+def write_tables(tables, path=TABLES_PATH):
+    """Serialize the tables; the file is swapped in atomically"""
+    header = np.array([len(tables[name]) for name, _ in TABLE_SECTIONS], dtype='<u8')
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(TABLES_MAGIC + struct.pack('<I', TABLES_VERSION) + header.tobytes())
+        for name, dtype in TABLE_SECTIONS:
+            data = np.ascontiguousarray(tables[name], dtype=dtype).tobytes()
+            f.write(data + b'\0' * (-len(data) % 8))
+    os.replace(temp_path, path)
+
+
+def read_tables(path=TABLES_PATH):
+    """Memory-map a tables file as read-only arrays"""
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    header_size = 8 + 8 * len(TABLE_SECTIONS)
+    if mapped[:4] != TABLES_MAGIC or struct.unpack('<I', mapped[4:8])[0] != TABLES_VERSION:
+        raise ValueError(f"{path} is not a version {TABLES_VERSION} lookup table file")
+    lengths = np.frombuffer(mapped, dtype='<u8', count=len(TABLE_SECTIONS), offset=8)
+
+    tables = {}
+    offset = header_size
+    for (name, dtype), length in zip(TABLE_SECTIONS, lengths.tolist()):
+        tables[name] = np.frombuffer(mapped, dtype=dtype, count=length, offset=offset)
+        size = tables[name].nbytes
+        offset += size + (-size % 8)
+    return tables
+
+
+def load_tables(path=TABLES_PATH):
+    """The evaluation tables, mapped from path (and written there first if missing)"""
+    global _tables
+    if _tables is None:
+        try:
+            _tables = read_tables(path)
+        except (OSError, ValueError):
+            tables = _build_tables()
+            try:
+                write_tables(tables, path)
+                tables = read_tables(path)
+            except OSError:
+                pass  # read-only location: keep the tables in memory
+            _tables = tables
+    return _tables
+
+
+def rank_hands(keys, suit_bits, size):
+    """Ranks of `size`-card hands from summed rank keys (...) and per-suit rank bits (..., 4)"""
+    tables = load_tables()
+    # Suits holding fewer than 5 cards map to NO_FLUSH, so the min picks any flush
+    flush = tables['flush'][suit_bits].min(axis=-1)
+    if size == 5:
+        return np.minimum(tables['ranks5'][np.searchsorted(tables['keys5'], keys)], flush)
+    slot_bits, bucket_bits = HASH_BITS[size]
+    hashed = np.asarray(keys, dtype=np.uint32) * tables['multipliers'][size - 6]
+    hashed += tables[f'displace{size}'][hashed >> np.uint32(32 - bucket_bits)]
+    hashed &= np.uint32((1 << slot_bits) - 1)
+    return np.minimum(tables[f'ranks{size}'][hashed], flush)
+
+
+def evaluate_showdowns(hands, boards, valid=None):
+    """Rank every hand on every board
+
+    hands is an (P, 2) array and boards an (B, 3..5) array of card indices;
+    the result is a (P, B) array of treys ranks (lower is better). valid,
+    an optional (P, B) mask, marks the pairs sharing no card; the others
+    are not evaluated and rank NO_FLUSH.
+    """
+    hands = np.asarray(hands)
+    boards = np.asarray(boards)
+    # The board contribution is summed once and shared by every player
+    board_keys = CARD_KEYS[boards].sum(axis=1)
+    board_bits = CARD_SUIT_BITS[boards].sum(axis=1)
+    hand_keys = CARD_KEYS[hands].sum(axis=1)
+    hand_bits = CARD_SUIT_BITS[hands].sum(axis=1)
+    keys = hand_keys[:, None] + board_keys[None, :]
+    suit_bits = hand_bits[:, None, :] + board_bits[None, :, :]
+    if valid is None:
+        return rank_hands(keys, suit_bits, hands.shape[1] + boards.shape[1])
+    # Duplicated cards can carry past the flush table's 13 bits, so those pairs
+    # look up no suited ranks
+    ranks = rank_hands(keys, np.where(valid[..., None], suit_bits, 0), hands.shape[1] + boards.shape[1])
+    return np.where(valid, ranks, NO_FLUSH)
+
+
+# Per treys card: its rank key in the low 24 bits plus a 1 in its suit's
+# nibble above them, so one sum yields the rank hash and all four suit counts
+SUIT_SHIFT = {1: 24, 2: 28, 4: 32, 8: 36}
+PACKED_CARDS = {
+    card: RANK_KEYS[Card.get_rank_int(card)] | (1 << SUIT_SHIFT[Card.get_suit_int(card)])
+    for card in CARD_INTS
+}
+
+
+def _unsuited_lookup(tables, size):
+    """Function from a non-flush `size`-card RANK_KEYS sum to its rank"""
+    slot_bits, bucket_bits = HASH_BITS[size]
+    multiplier = int(tables['multipliers'][size - 6])
+    shift, mask = 32 - bucket_bits, (1 << slot_bits) - 1
+    # memoryviews index straight into the mapped file and return ints
+    displacements, ranks = memoryview(tables[f'displace{size}']), memoryview(tables[f'ranks{size}'])
+
+    def lookup(key):
+        hashed = key * multiplier & 0xFFFFFFFF
+        return ranks[(hashed + displacements[hashed >> shift]) & mask]
+    return lookup
+
+
+class SevenCardEvaluator(Evaluator):
+    """Evaluator that scores 7 cards in a single pass instead of 21 five-card lookups
+
+    Ranks are identical to treys (1 = royal flush, 7462 = worst high card).
+    All hand sizes read the memory-mapped flat tables, so no treys
+    LookupTable is built.
+    """
+
+    def __init__(self, path=TABLES_PATH):
+        tables = load_tables(path)
+        # memoryviews index straight into the mapped file and return ints
+        self.flush_table = memoryview(tables['flush'])
+        # Only 6,175 five-card rank multisets, so a dict maps their sums directly
+        self.unsuited5 = dict(zip(tables['keys5'].tolist(), tables['ranks5'].tolist()))
+        self.unsuited6 = _unsuited_lookup(tables, 6)
+        self.unsuited7 = _unsuited_lookup(tables, 7)
+        self.hand_size_map = {
+            5: self._five,
+            6: self._six,
+            7: self._seven
+        }
+
+    def evaluate_many(self, hands, boards):
+        """Rank N hands on M boards in one call
+
+        hands is an (N, 2) and boards an (M, 3..5) array-like of treys card
+        ints; returns an (N, M) array of ranks, row n for hands[n].
+        """
+        hands = np.asarray(hands).reshape(len(hands), -1)
+        boards = np.asarray(boards).reshape(len(boards), -1)
+        return evaluate_showdowns(card_indices(hands), card_indices(boards))
+
+    def _flush_rank(self, cards, total):
+        """Best flush among cards if a suit holds 5 or more of them, else None"""
+        # A nibble of 5 or more overflows into its top bit after adding 3
+        if not ((total >> 24) + 0x3333) & 0x8888:
+            return None
+        for suit, shift in SUIT_SHIFT.items():
+            if (total >> shift) & 0xF >= 5:
+                break
+        bits = 0
+        for card in cards:
+            if (card >> 12) & suit:
+                bits |= card >> 16
+        # With 5+ cards of one suit out of 7 no full house or quads is possible
+        return self.flush_table[bits]
+
+    def _five(self, cards):
+        # Five cards make a flush only if all share a suit, as in treys
+        if cards[0] & cards[1] & cards[2] & cards[3] & cards[4] & 0xF000:
+            return self.flush_table[(cards[0] | cards[1] | cards[2] | cards[3] | cards[4]) >> 16]
+        packed = PACKED_CARDS
+        return self.unsuited5[(packed[cards[0]] + packed[cards[1]] + packed[cards[2]] + packed[cards[3]]
+                               + packed[cards[4]]) & 0xFFFFFF]
+
+    def _six(self, cards):
+        total = sum(map(PACKED_CARDS.__getitem__, cards))
+        rank = self._flush_rank(cards, total)
+        if rank is None:
+            rank = self.unsuited6(total & 0xFFFFFF)
+        return rank
+
+    def _seven(self, cards):
+        total = sum(map(PACKED_CARDS.__getitem__, cards))
+        if ((total >> 24) + 0x3333) & 0x8888:
+            return self._flush_rank(cards, total)
+        return self.unsuited7(total & 0xFFFFFF)
+
+    def prepare_board(self, board):
+        """Board-only work for a 5-card board, shared by every hand played on it
+
+        Returns (packed board sum, flush suit, flush suit rank bits). Only a
+        suit with 3 or more board cards can make a flush, and a 5-card board
+        has at most one; flush suit is 0 when there is none.
+        """
+        total = sum(map(PACKED_CARDS.__getitem__, board))
+        # As in _flush_rank: a nibble of 3 or more overflows after adding 5
+        if not ((total >> 24) + 0x5555) & 0x8888:
+            return total, 0, 0
+        for suit, shift in SUIT_SHIFT.items():
+            if (total >> shift) & 0xF >= 3:
+                bits = 0
+                for card in board:
+                    if (card >> 12) & suit:
+                        bits |= card >> 16
+                return total, suit, bits
+        return total, 0, 0
+
+    def evaluate_prepared(self, prepared, hand):
+        """Rank two hole cards on a board from prepare_board"""
+        board_total, flush_suit, flush_bits = prepared
+        total = board_total + PACKED_CARDS[hand[0]] + PACKED_CARDS[hand[1]]
+        if flush_suit and ((total >> 24) + 0x3333) & 0x8888:
+            for card in hand:
+                if (card >> 12) & flush_suit:
+                    flush_bits |= card >> 16
+            return self.flush_table[flush_bits]
+        return self.unsuited7(total & 0xFFFFFF)
+
+    def evaluate_hands(self, hands, board):
+        """Rank several hands on one board, doing the board work only once"""
+        if len(board) != 5:
+            return [self.evaluate(hand, board) for hand in hands]
+        prepared = self.prepare_board(board)
+        board_total, flush_suit, _ = prepared
+        packed = PACKED_CARDS
+        unsuited = self.unsuited7
+        ranks = []
+        for hand in hands:
+            total = board_total + packed[hand[0]] + packed[hand[1]]
+            if flush_suit and ((total >> 24) + 0x3333) & 0x8888:
+                ranks.append(self.evaluate_prepared(prepared, hand))
+            else:
+                ranks.append(unsuited(total & 0xFFFFFF))
+        return ranks
+
+
+def benchmark(hands=100000, seed=0):
+    """Evaluations per second of the stock and single-pass 7-card evaluators"""
+    rng = random.Random(seed)
+    deck = Deck.GetFullDeck()
+    samples = [rng.sample(deck, 7) for _ in range(hands)]
+    results = {}
+    for evaluator in (Evaluator(), SevenCardEvaluator()):
+        started = time.perf_counter()
+        for cards in samples:
+            evaluator.evaluate(cards[:2], cards[2:])
+        results[type(evaluator).__name__] = hands / (time.perf_counter() - started)
+    return results
+
+
+def benchmark_showdowns(boards=20000, seed=0):
+    """Showdowns per second by player count: every hand from scratch vs a prepared board"""
+    rng = random.Random(seed)
+    deck = Deck.GetFullDeck()
+    evaluator = SevenCardEvaluator()
+    results = {}
+    for players in range(2, 11):
+        deals = [rng.sample(deck, 2 * players + 5) for _ in range(boards)]
+        spots = [([deal[2 * i:2 * i + 2] for i in range(players)], deal[-5:]) for deal in deals]
+
+        started = time.perf_counter()
+        for hands, board in spots:
+            for hand in hands:
+                evaluator.evaluate(hand, board)
+        scratch = boards / (time.perf_counter() - started)
+
+        started = time.perf_counter()
+        for hands, board in spots:
+            evaluator.evaluate_hands(hands, board)
+        prepared = boards / (time.perf_counter() - started)
+
+        results[players] = (scratch, prepared)
+    return results
+
+
+if __name__ == "__main__":
+    for name, rate in benchmark().items():
+        print(f"{name:<20} {rate:>12,.0f} evaluations/s")
+    print()
+    print(f"{'Players':<8} {'From scratch':>14} {'Prepared board':>16} {'Speedup':>8}   (showdowns/s)")
+    for players, (scratch, prepared) in benchmark_showdowns().items():
+        print(f"{players:<8} {scratch:>14,.0f} {prepared:>16,.0f} {prepared / scratch:>7.2f}x")
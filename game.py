@@ -0,0 +1,237 @@
+import random
+import threading
+
+from treys import Deck
+
+import equity
+import equity_cache
+import preflop
+from evaluator import SevenCardEvaluator
+
+# Board cards dealt on each street, each after one burn card
+STREETS = (('flop', 3), ('turn', 1), ('river', 1))
+
+_evaluator = None
+_preflop_table = None
+_preflop_loaded = False
+
+
+def guess_accuracy(guess, true):
+    """Score from 0 to 100 for an equity guess, by its error relative to the true equity"""
+    if true > 0:
+        return max(0, 100 - (abs(guess - true) / true * 100))
+    return 100 if guess == 0 else 0
+
+
+def shared_evaluator():
+    """One SevenCardEvaluator for every game in the process"""
+    global _evaluator
+    if _evaluator is None:
+        _evaluator = SevenCardEvaluator()
+    return _evaluator
+
+
+def shared_preflop_table():
+    """The preflop table shared by every game, or None if it has not been generated"""
+    global _preflop_table, _preflop_loaded
+    if not _preflop_loaded:
+        _preflop_table = preflop.load_table()
+        _preflop_loaded = True
+    return _preflop_table
+
+
+class PokerHand:
+    """State machine for one table: deck, dealing, folds, equity and showdown
+
+    Nothing here reads input, prints or sleeps. Each change is announced to
+    the subscribers as listener(event, data), after the state is updated:
+
+    - 'street_changed' {'street'}: 'preflop', 'flop', 'turn' or 'river'
+    - 'card_dealt' {'seat', 'card'}: seat is None for a board card
+    - 'card_burned' {}
+    - 'player_folded' {'seat'}
+    - 'equity_ready' {'equity', 'result'}: may arrive on an equity worker thread
+    - 'showdown' {'winners', 'rank'}
+
+    The evaluator, preflop table and equity cache are shared between games,
+    so a process can hold thousands of tables: about 5 KB for a dealt
+    6-seat hand, 29 KB once the flop's equity session holds its runout
+    ranks. An optional metrics.GameMetrics is subscribed and fed the equity
+    work done.
+    """
+
+    def __init__(self, players=0, evaluator=None, equity_pool=None, cache=None, rng=None, metrics=None):
+        self.players = players
+        self.deck = []
+        self.player_cards = []
+        self.community_cards = []
+        self.folded_players = set()
+        self.street = None
+        self.listeners = []
+        self.rng = rng or random  # random.Random-like, for reproducible decks
+        self.evaluator = evaluator or shared_evaluator()
+        self.equity_pool = equity_pool  # optional parallel.ParallelEquity
+        self.preflop_table = shared_preflop_table()  # None until generated
+        self.equity_cache = cache or equity_cache.shared_cache
+        self.equity_session = None  # reuses flop work on later streets and after folds
+        self.equity_lock = threading.Lock()
+        self.metrics = metrics
+        if metrics is not None:
+            self.subscribe(metrics)
+
+    def subscribe(self, listener):
+        """Call listener(event, data) for every event from now on"""
+        self.listeners.append(listener)
+
+    def _emit(self, event, **data):
+        for listener in self.listeners:
+            listener(event, data)
+
+    def new_hand(self, players=None):
+        """Start a fresh hand with a newly shuffled deck"""
+        if players is not None:
+            self.players = players
+        self.deck = Deck.GetFullDeck()[:]
+        self.rng.shuffle(self.deck)
+        self.player_cards = [[] for _ in range(self.players)]
+        self.community_cards = []
+        self.folded_players = set()
+        self.street = None
+        self.equity_session = None
+
+    def load_position(self, hands, board):
+        """Set up a given position instead of dealing one; no events are emitted"""
+        self.new_hand(len(hands))
+        self.player_cards = [list(hand) for hand in hands]
+        self.community_cards = list(board)
+        dealt = set(self.community_cards).union(*self.player_cards)
+        self.deck = [card for card in self.deck if card not in dealt]
+        self.street = STREETS[len(board) - 3][0] if len(board) >= 3 else 'preflop'
+
+    def active_players(self):
+        """Seats that have not folded"""
+        return [i for i in range(self.players) if i not in self.folded_players]
+
+    def _set_street(self, street):
+        self.street = street
+        self._emit('street_changed', street=street)
+
+    def deal_cards(self):
+        """Deal 2 hole cards to each player, one round at a time"""
+        self._set_street('preflop')
+        for _ in range(2):
+            for seat in range(self.players):
+                card = self.deck.pop()
+                self.player_cards[seat].append(card)
+                self._emit('card_dealt', seat=seat, card=card)
+
+    def _deal_board(self, street, count):
+        self._set_street(street)
+        self.deck.pop()  # Burn card
+        self._emit('card_burned')
+        for _ in range(count):
+            card = self.deck.pop()
+            self.community_cards.append(card)
+            self._emit('card_dealt', seat=None, card=card)
+
+    def deal_flop(self):
+        """Burn a card and deal the flop (3 community cards)"""
+        self._deal_board('flop', 3)
+
+    def deal_turn(self):
+        """Burn a card and deal the turn (1 community card)"""
+        self._deal_board('turn', 1)
+
+    def deal_river(self):
+        """Burn a card and deal the river (1 community card)"""
+        self._deal_board('river', 1)
+
+    def deal_street(self):
+        """Deal whichever of the flop, turn and river comes next"""
+        self._deal_board(*STREETS[max(len(self.community_cards) - 2, 0)])
+
+    def fold(self, seats):
+        """Fold the given seats; returns the ones that were still active"""
+        folded = []
+        for seat in seats:
+            if 0 <= seat < self.players and seat not in self.folded_players:
+                self.folded_players.add(seat)
+                folded.append(seat)
+                self._emit('player_folded', seat=seat)
+        return folded
+
+    def estimate_equity(self, tolerance=equity.DEFAULT_TOLERANCE, time_budget=equity.DEFAULT_TIME_BUDGET, cancel=None):
+        """Equity per active player plus the EquityResult with samples and error"""
+        for step in self.iter_equity(tolerance, time_budget, cancel):
+            pass
+        return step
+
+    def iter_equity(self, tolerance=equity.DEFAULT_TOLERANCE, time_budget=equity.DEFAULT_TIME_BUDGET, cancel=None):
+        """Yield (equity per active player, EquityResult) pairs as the estimate refines
+
+        Exact answers arrive in one step; pre-flop sampling yields after every
+        batch with narrowing error bars, so a consumer can stop whenever the
+        accuracy is good enough. Only a completed run is announced, and only
+        one that met the tolerance is cached; a run stopped by the time budget
+        would otherwise be served to later callers as if it had. Cached
+        sampled results wider than the tolerance are recomputed. The equity
+        lock is held until the generator finishes or is closed.
+        """
+        with self.equity_lock:
+            # One snapshot keys the cache and feeds the solver, even if a card
+            # is dealt on another thread meanwhile
+            active_players = self.active_players()
+            board = list(self.community_cards)
+            if len(active_players) < 2:
+                result = equity.exact_result([equity.POT_UNITS] * len(active_players), 1)
+                yield dict(zip(active_players, result.equity)), result
+                self._emit('equity_ready', equity=dict(zip(active_players, result.equity)), result=result)
+                return
+
+            # Get player hands (already in treys format)
+            player_hands = [self.player_cards[i] for i in active_players]
+
+            # Isomorphic spots from any game share one cache entry
+            key = self.equity_cache.situation_key(player_hands, board)
+            result = self.equity_cache.get(key, tolerance)
+            if self.metrics is not None:
+                self.metrics.record_cache(result is not None)
+            if result is not None:
+                yield dict(zip(active_players, result.equity)), result
+                self._emit('equity_ready', equity=dict(zip(active_players, result.equity)), result=result)
+                return
+
+            # Exact enumeration on the flop, turn and river (reused from the flop
+            # by the hand's session); adaptive Monte Carlo pre-flop
+            if not board and len(player_hands) == 2 and self.preflop_table:
+                results = [self.preflop_table.solve_equity(player_hands)]
+            elif len(board) >= 3:
+                if self.equity_session is None:
+                    self.equity_session = equity.EquitySession(self.player_cards)
+                results = [self.equity_session.solve_equity(board, active_players, self.metrics)]
+            elif self.equity_pool:
+                results = [self.equity_pool.solve_equity(player_hands, board)]
+            else:
+                results = equity.iter_equity(self.evaluator, player_hands, board,
+                                             tolerance, time_budget, cancel=cancel, metrics=self.metrics)
+            for result in results:
+                yield dict(zip(active_players, result.equity)), result
+
+            # A cancelled sampling run is cut short, so it is not worth keeping
+            if cancel is None or not cancel.is_set():
+                if result.interval_width() <= tolerance:
+                    self.equity_cache.put(key, result)
+                self._emit('equity_ready', equity=dict(zip(active_players, result.equity)), result=result)
+
+    def showdown(self):
+        """Rank the remaining hands on the full board; returns (winners, best rank)"""
+        if len(self.community_cards) != 5:
+            raise ValueError("The showdown needs all 5 board cards")
+        active_players = self.active_players()
+        winners, best_rank = [], None
+        if active_players:
+            ranks = self.evaluator.evaluate_hands([self.player_cards[i] for i in active_players], self.community_cards)
+            best_rank = min(ranks)
+            winners = [seat for seat, rank in zip(active_players, ranks) if rank == best_rank]
+        self._emit('showdown', winners=winners, rank=best_rank)
+        return winners, best_rank
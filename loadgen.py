@@ -0,0 +1,86 @@
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+import numpy as np
+
+from server import DEFAULT_HOST, DEFAULT_PORT
+
+
+async def _command(reader, writer, message, until=None):
+    """Send one command and, with until, read replies up to that event"""
+    writer.write(json.dumps(message).encode() + b'\n')
+    await writer.drain()
+    while until is not None:
+        reply = json.loads(await reader.readline())
+        if reply['event'] == 'error':
+            raise RuntimeError(reply['message'])
+        if reply['event'] == until:
+            return reply
+
+
+async def play(host, port, hands, players, fold_rate, rng, latencies):
+    """One simulated player: plays hands and records street-to-equity latency"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(hands):
+            count = players or rng.randint(2, 10)
+            await _command(reader, writer, {'op': 'new_hand', 'players': count})
+            active = list(range(count))
+            for street in range(3):
+                started = time.perf_counter()
+                await _command(reader, writer, {'op': 'deal'})
+                guesses = {str(seat): 100 / len(active) for seat in active}
+                await _command(reader, writer, {'op': 'guess', 'guesses': guesses}, until='equity')
+                latencies.append(time.perf_counter() - started)
+                if street == 2:
+                    break
+                folds = [seat for seat in active[1:] if rng.random() < fold_rate]
+                if folds:
+                    await _command(reader, writer, {'op': 'fold', 'seats': folds})
+                    active = [seat for seat in active if seat not in folds]
+            await _command(reader, writer, {'op': 'showdown'}, until='showdown')
+        return await _command(reader, writer, {'op': 'stats'}, until='stats')
+    finally:
+        writer.close()
+
+
+async def run(host, port, clients, hands, players, fold_rate, seed):
+    """Run the simulated players concurrently; returns (latencies, seconds, server stats)"""
+    rng = random.Random(seed)
+    latencies = []
+    started = time.perf_counter()
+    stats = await asyncio.gather(*[
+        play(host, port, hands, players, fold_rate, random.Random(rng.random()), latencies)
+        for _ in range(clients)
+    ])
+    return latencies, time.perf_counter() - started, stats[-1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate concurrent players against server.py")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--clients', type=int, default=50, help="concurrent simulated players")
+    parser.add_argument('--hands', type=int, default=20, help="hands per player")
+    parser.add_argument('--players', type=int, default=0, help="players per hand (default: random 2-10)")
+    parser.add_argument('--fold-rate', type=float, default=0.2, help="chance each seat folds after a street")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    latencies, elapsed, stats = asyncio.run(
+        run(args.host, args.port, args.clients, args.hands, args.players, args.fold_rate, args.seed))
+    p50, p99 = np.percentile(np.array(latencies) * 1000, [50, 99])
+    print(f"{len(latencies):,} equity results from {args.clients} clients in {elapsed:.1f}s "
+          f"({len(latencies) / elapsed:,.0f}/s)")
+    print(f"  Latency p50 {p50:.1f} ms, p99 {p99:.1f} ms")
+    print(f"  Server: {stats['computed']:,} computed, {stats['coalesced']:,} coalesced, "
+          f"cache hit rate {stats['cache']['hit_rate']:.1%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+import cProfile
+import json
+import os
+import threading
+
+import equity_cache
+
+# Work counters kept for each street
+FIELDS = (
+    'equity_calls', 'equity_seconds', 'input_seconds',
+    'sampling_seconds', 'evaluation_seconds', 'bookkeeping_seconds',
+    'samples', 'evaluations', 'cache_hits', 'cache_misses',
+)
+
+
+class GameMetrics:
+    """Opt-in timers and counters for a PokerHand, grouped by street
+
+    Subscribe it to a game so work is attributed to the street being
+    played. The equity code reports its split between sampling (or runout
+    enumeration), hand evaluation and bookkeeping through record_work;
+    calls may come from an equity worker thread.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.street = 'setup'
+        self.streets = {}
+
+    def __call__(self, event, data):
+        if event == 'street_changed':
+            self.street = data['street']
+
+    def _add(self, **values):
+        with self.lock:
+            counters = self.streets.setdefault(self.street, dict.fromkeys(FIELDS, 0))
+            for name, value in values.items():
+                counters[name] += value
+
+    def record_work(self, sampling=0.0, evaluation=0.0, bookkeeping=0.0, samples=0, evaluations=0):
+        """Add time spent in each phase of an equity calculation and the work done"""
+        self._add(sampling_seconds=sampling, evaluation_seconds=evaluation, bookkeeping_seconds=bookkeeping,
+                  samples=samples, evaluations=evaluations)
+
+    def record_equity(self, seconds):
+        """Add one calculate_equity call and its wall time"""
+        self._add(equity_calls=1, equity_seconds=seconds)
+
+    def record_cache(self, hit):
+        """Count an equity cache lookup"""
+        self._add(cache_hits=int(hit), cache_misses=int(not hit))
+
+    def record_input(self, seconds):
+        """Add time spent waiting for the user"""
+        self._add(input_seconds=seconds)
+
+    def snapshot(self):
+        """Counters per street and in total, with derived rates, as plain dicts"""
+        with self.lock:
+            streets = {street: dict(counters) for street, counters in self.streets.items()}
+        total = dict.fromkeys(FIELDS, 0)
+        for counters in streets.values():
+            for name in FIELDS:
+                total[name] += counters[name]
+        for counters in list(streets.values()) + [total]:
+            work = counters['sampling_seconds'] + counters['evaluation_seconds'] + counters['bookkeeping_seconds']
+            counters['samples_per_second'] = counters['samples'] / work if work else 0.0
+            counters['evaluations_per_second'] = counters['evaluations'] / work if work else 0.0
+            lookups = counters['cache_hits'] + counters['cache_misses']
+            counters['cache_hit_rate'] = counters['cache_hits'] / lookups if lookups else 0.0
+        return {'streets': streets, 'total': total, 'shared_cache': equity_cache.shared_cache.stats()}
+
+    def dump(self, path):
+        """Write the snapshot to path as JSON"""
+        with open(path, 'w') as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+
+class StreetProfiler:
+    """Subscriber that runs cProfile for each street and writes one file per street
+
+    Files are named hand<N>-<street>.prof in directory and can be read
+    with pstats or snakeviz. Only the thread driving the game is profiled.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.profile = None
+        self.name = None
+        self.hands = 0
+
+    def __call__(self, event, data):
+        if event == 'street_changed':
+            if data['street'] == 'preflop':
+                self.hands += 1
+            self.stop()
+            self.name = f"hand{self.hands}-{data['street']}"
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        elif event == 'showdown':
+            self.stop()
+
+    def stop(self):
+        """Finish the current street's profile and write it out"""
+        if self.profile is not None:
+            self.profile.disable()
+            self.profile.dump_stats(os.path.join(self.directory, self.name + '.prof'))
+            self.profile = None
+
@@ -0,0 +1,96 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import equity
+from canonical import weighted_runouts
+from evaluator import SevenCardEvaluator
+
+# Monte Carlo samples and enumerated runout classes handled by one task.
+# Shards are sized independently of the pool so the same seed always gives
+# the same split, and therefore bit-identical results for any number of workers.
+SIMULATION_SHARD = 2500
+ENUMERATION_SHARD = 250
+
+_worker_evaluator = None
+
+
+def init_worker():
+    """Pool initializer: build the evaluator lookup tables once when a worker starts
+
+    Any ProcessPoolExecutor started with this initializer can run the
+    worker tasks below, solve_spot included.
+    """
+    global _worker_evaluator
+    _worker_evaluator = SevenCardEvaluator()
+
+
+def solve_spot(hands, board):
+    """Worker task: EquityResult for one whole spot, as a dict"""
+    return equity.solve_equity(_worker_evaluator, hands, board).to_dict()
+
+
+def _enumerate_shard(hands, board, runouts):
+    """Worker task: exact pot shares over one slice of the weighted runout classes"""
+    return equity.enumerate_shares(_worker_evaluator, hands, board, runouts)
+
+
+def _simulate_shard(hands, board, simulations, entropy, shard):
+    """Worker task: sampled pot shares from the shard's own RNG stream"""
+    rng = np.random.default_rng(np.random.SeedSequence(entropy, spawn_key=(shard,)))
+    return equity.vectorized_shares(hands, board, simulations, rng)
+
+
+class ParallelEquity:
+    """Process pool that shards equity calculations across CPU cores"""
+
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Shut the worker processes down"""
+        self.pool.shutdown()
+
+    def solve_equity(self, hands, board, simulations=equity.DEFAULT_SIMULATIONS, seed=None):
+        """EquityResult for each hand; a given seed reproduces it exactly"""
+        hands = [list(hand) for hand in hands]
+        board = list(board)
+        total = equity.runout_count(hands, board)
+
+        # Pot units are integers, so merging shards is exact in any order
+        shares = [0] * len(hands)
+        if total <= simulations:
+            # The symmetry classes are listed once and split by class count
+            runouts = list(weighted_runouts(hands, board))
+            futures = [
+                self.pool.submit(_enumerate_shard, hands, board, runouts[start:start + ENUMERATION_SHARD])
+                for start in range(0, len(runouts), ENUMERATION_SHARD)
+            ]
+            for future in futures:
+                shard_shares, _ = future.result()
+                shares = [a + b for a, b in zip(shares, shard_shares)]
+            return equity.exact_result(shares, total)
+
+        entropy = np.random.SeedSequence(seed).entropy
+        futures = [
+            self.pool.submit(_simulate_shard, hands, board, min(SIMULATION_SHARD, simulations - start), entropy, shard)
+            for shard, start in enumerate(range(0, simulations, SIMULATION_SHARD))
+        ]
+        squares = [0] * len(hands)
+        for future in futures:
+            shard_shares, shard_squares = future.result()
+            shares = [a + b for a, b in zip(shares, shard_shares)]
+            squares = [a + b for a, b in zip(squares, shard_squares)]
+        return equity.sampled_result(shares, squares, simulations)
+
+    def calculate_equity(self, hands, board, simulations=equity.DEFAULT_SIMULATIONS, seed=None):
+        """Equity for each hand; a given seed reproduces it exactly"""
+        return self.solve_equity(hands, board, simulations, seed).equity
@@ -1,8 +1,15 @@
-import random
+import argparse
 import sys
+import threading
 import time
-from itertools import combinations
-from treys import Card, Evaluator, Deck
+from concurrent.futures import ThreadPoolExecutor, wait
+from treys import Card
+
+import equity
+import metrics
+import scenario_index
+import scenarios
+from game import PokerHand, guess_accuracy
 
 # Color codes for terminal output
 class Colors:
@@ -23,104 +30,91 @@ class Colors:
     SPADES = '\033[97m'  # White
     CLUBS = '\033[97m'  # White
 
-class PokerGame:
-    def __init__(self):
+class PokerGame(PokerHand):
+    """Terminal equity-guessing game; renders the PokerHand events it subscribes to"""
+
+    def __init__(self, equity_pool=None, cache=None, bank=None, game_metrics=None, profile_dir=None):
+        super().__init__(equity_pool=equity_pool, cache=cache, metrics=game_metrics)
+        self.bank = bank  # optional ScenarioBank, or ScenarioQuery to drill, for quiz mode
+        # Optional per-street cProfile output; equity then runs on the profiled thread
+        self.profiler = metrics.StreetProfiler(profile_dir) if profile_dir else None
+        if self.profiler:
+            self.subscribe(self.profiler)
         self.ranks = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
         self.suits = ['H', 'D', 'S', 'C']
         self.rank_values = {rank: i for i, rank in enumerate(self.ranks)}
-        self.deck = None
-        self.players = 0
-        self.player_cards = []
-        self.community_cards = []
         self.player_names = []
-        self.folded_players = set()
-        self.evaluator = Evaluator()
-        
-    def create_deck(self):
-        """Create and shuffle a new treys deck"""
-        self.deck = Deck()
-        
-    def _draw_one(self, deck=None):
-        """Draw exactly one card int from a treys Deck, regardless of return type."""
-        d = deck or self.deck
-        c = d.draw(1)  # some treys forks return [int] for n=1; others return int for draw()
-        if isinstance(c, list):
-            if not c:
-                raise RuntimeError("Deck is empty")
-            return c[0]
-        return c
+        # Equity is computed on a worker thread while the user types guesses
+        self.equity_executor = ThreadPoolExecutor(max_workers=1)
+        self.pending_equity = None  # (spot, future, cancel event, latest step)
+        self.subscribe(self.render_event)
         
     def get_player_count(self):
         """Get number of players from user input"""
         while True:
             try:
-                self.players = int(input(f"{Colors.CYAN}Enter number of players (2-10): {Colors.END}"))
+                self.players = int(self.read_input(f"{Colors.CYAN}Enter number of players (2-10): {Colors.END}"))
                 if 2 <= self.players <= 10:
                     break
                 print(f"{Colors.YELLOW}Please enter a number between 2 and 10{Colors.END}")
             except ValueError:
                 print(f"{Colors.RED}Please enter a valid number{Colors.END}")
         
-        self.player_cards = [[] for _ in range(self.players)]
         self.player_names = [f"Player {i+1}" for i in range(self.players)]
+        self.new_hand()
         
-    def deal_cards(self):
-        """Deal 2 cards to each player with visual effects"""
-        print(f"\n{Colors.BOLD}{Colors.BLUE}🎯 Dealing hole cards...{Colors.END}")
-        time.sleep(1)
-        
-        for round_num in range(2):
-            print(f"{Colors.CYAN}Dealing round {round_num + 1}...{Colors.END}")
-            for player_idx in range(self.players):
-                card = self._draw_one()
-                self.player_cards[player_idx].append(card)
-                print(f"  {Colors.GREEN}→{Colors.END} {self.player_names[player_idx]}: {self.format_card(card)}")
-                time.sleep(0.3)
+    def read_input(self, prompt=''):
+        """input(), with the wait counted as input time when metrics are on"""
+        started = time.perf_counter()
+        try:
+            return input(prompt)
+        finally:
+            if self.metrics is not None:
+                self.metrics.record_input(time.perf_counter() - started)
+
+    def render_event(self, event, data):
+        """Print game events with visual effects and pacing"""
+        if event == 'street_changed':
+            self.render_street(data['street'])
+        elif event == 'card_burned':
+            print(f"{Colors.YELLOW}🔥 Burn card{Colors.END}")
             time.sleep(0.5)
-            
-    def deal_flop(self):
-        """Deal the flop (3 community cards) with visual effects"""
-        print(f"\n{Colors.BOLD}{Colors.PURPLE}🔥 Dealing the FLOP...{Colors.END}")
+        elif event == 'card_dealt':
+            self.render_card(data['seat'], data['card'])
+        elif event == 'player_folded':
+            print(f"{Colors.RED}❌ {self.player_names[data['seat']]} has been folded{Colors.END}")
+            time.sleep(0.5)
+        elif event == 'showdown':
+            self.render_showdown(data['winners'], data['rank'])
+
+    def render_street(self, street):
+        """Announce the street about to be dealt"""
+        if street == 'preflop':
+            print(f"\n{Colors.BOLD}{Colors.BLUE}🎯 Dealing hole cards...{Colors.END}")
+        elif street == 'flop':
+            print(f"\n{Colors.BOLD}{Colors.PURPLE}🔥 Dealing the FLOP...{Colors.END}")
+        elif street == 'turn':
+            print(f"\n{Colors.BOLD}{Colors.PURPLE}🔄 Dealing the TURN...{Colors.END}")
+        elif street == 'river':
+            print(f"\n{Colors.BOLD}{Colors.PURPLE}🌊 Dealing the RIVER...{Colors.END}")
         time.sleep(1)
-        
-        self._draw_one()  # Burn card
-        print(f"{Colors.YELLOW}🔥 Burn card{Colors.END}")
-        time.sleep(0.5)
-        
-        for i in range(3):
-            card = self._draw_one()
-            self.community_cards.append(card)
-            print(f"  {Colors.GREEN}→{Colors.END} Community card {i+1}: {self.format_card(card)}")
+
+    def render_card(self, seat, card):
+        """Show one dealt card, to a player or to the board"""
+        if seat is not None:
+            if seat == 0:
+                print(f"{Colors.CYAN}Dealing round {len(self.player_cards[seat])}...{Colors.END}")
+            print(f"  {Colors.GREEN}→{Colors.END} {self.player_names[seat]}: {self.format_card(card)}")
+            time.sleep(0.3)
+            if seat == self.players - 1:
+                time.sleep(0.5)
+        elif self.street == 'flop':
+            print(f"  {Colors.GREEN}→{Colors.END} Community card {len(self.community_cards)}: {self.format_card(card)}")
             time.sleep(0.4)
+        else:
+            print(f"  {Colors.GREEN}→{Colors.END} {self.street.capitalize()} card: {self.format_card(card)}")
+            time.sleep(0.5)
             
-    def deal_turn(self):
-        """Deal the turn (1 community card) with visual effects"""
-        print(f"\n{Colors.BOLD}{Colors.PURPLE}🔄 Dealing the TURN...{Colors.END}")
-        time.sleep(1)
-        
-        self._draw_one()  # Burn card
-        print(f"{Colors.YELLOW}🔥 Burn card{Colors.END}")
-        time.sleep(0.5)
-        
-        card = self._draw_one()
-        self.community_cards.append(card)
-        print(f"  {Colors.GREEN}→{Colors.END} Turn card: {self.format_card(card)}")
-        time.sleep(0.5)
-        
-    def deal_river(self):
-        """Deal the river (1 community card) with visual effects"""
-        print(f"\n{Colors.BOLD}{Colors.PURPLE}🌊 Dealing the RIVER...{Colors.END}")
-        time.sleep(1)
-        
-        self._draw_one()  # Burn card
-        print(f"{Colors.YELLOW}🔥 Burn card{Colors.END}")
-        time.sleep(0.5)
-        
-        card = self._draw_one()
-        self.community_cards.append(card)
-        print(f"  {Colors.GREEN}→{Colors.END} River card: {self.format_card(card)}")
-        time.sleep(0.5)
-        
     def format_card(self, treys_card):
         """Format a treys card with colors and symbols"""
         # Convert treys card to string format first
@@ -194,7 +188,7 @@ class PokerGame:
                 
             while True:
                 try:
-                    guess = float(input(f"{Colors.YELLOW}Enter equity for {self.player_names[i]}: {Colors.END}"))
+                    guess = float(self.read_input(f"{Colors.YELLOW}Enter equity for {self.player_names[i]}: {Colors.END}"))
                     if 0 <= guess <= 100:
                         guesses[i] = guess
                         break
@@ -204,101 +198,73 @@ class PokerGame:
         
         return guesses
         
+    def _equity_spot(self):
+        """The board and folds that an equity result depends on"""
+        return tuple(self.community_cards), frozenset(self.folded_players)
+
+    def _track_equity(self, cancel, latest):
+        """Worker task: run iter_equity, keeping the newest step in latest[0]"""
+        for step in self.iter_equity(cancel=cancel):
+            latest[0] = step
+        return step
+
+    def prefetch_equity(self):
+        """Start computing equity for the current spot on the worker thread"""
+        spot = self._equity_spot()
+        if self.profiler or self.pending_equity and self.pending_equity[0] == spot:
+            return
+        self.cancel_prefetch()
+        cancel = threading.Event()
+        latest = [None]
+        future = self.equity_executor.submit(self._track_equity, cancel, latest)
+        self.pending_equity = (spot, future, cancel, latest)
+
+    def cancel_prefetch(self):
+        """Stop any background equity work for a spot that no longer applies"""
+        if self.pending_equity:
+            _, future, cancel, _ = self.pending_equity
+            cancel.set()
+            future.cancel()
+            self.pending_equity = None
+
+    def show_equity_progress(self, result, tolerance=equity.DEFAULT_TOLERANCE):
+        """Redraw the live equity bar on the current line for a partial result"""
+        width = result.interval_width()
+        # Samples needed grow with the inverse square of the interval width
+        done = 1.0 if result.exact or width <= tolerance else (tolerance / width) ** 2
+        filled = int(done * 30)
+        bar = '█' * filled + '░' * (30 - filled)
+        sys.stdout.write(f"\r{Colors.CYAN}⏳ Equity {bar} {result.samples:,} samples, "
+                         f"±{width / 2:.2f}%{Colors.END}\033[K")
+        sys.stdout.flush()
+
     def calculate_equity(self):
         """Calculate true equity using treys library"""
-        if len(self.community_cards) < 5:
-            # Use treys for accurate equity calculation with incomplete board
-            active_players = [i for i in range(self.players) if i not in self.folded_players]
-            if len(active_players) < 2:
-                return {active_players[0]: 100.0} if active_players else {}
-                
-            # Get player hands (already in treys format)
-            player_hands = [self.player_cards[i] for i in active_players]
-                
-            # Get all dealt cards to exclude from simulation
-            dealt_cards = set()
-            for hand in player_hands:
-                dealt_cards.update(hand)
-            dealt_cards.update(self.community_cards)
-                
-            # Calculate equity using treys
-            equity = {}
-            simulations = 10000  # More simulations for accuracy
-            
-            wins = [0] * len(active_players)
-            ties = [0] * len(active_players)
-            
-            for _ in range(simulations):
-                # Create a new deck for each simulation
-                deck = Deck()
-                
-                # Deal remaining community cards (avoiding dealt cards)
-                sim_board = self.community_cards.copy()
-                remaining_cards_needed = 5 - len(sim_board)
-                
-                for _ in range(remaining_cards_needed):
-                    while True:
-                        card = self._draw_one(deck)
-                        if card not in dealt_cards:
-                            sim_board.append(card)
-                            break
-                    
-                # Evaluate each player's hand
-                best_score = float('inf')  # Lower is better in treys
-                winners = []
-                
-                for i, hand in enumerate(player_hands):
-                    score = self.evaluator.evaluate(hand, sim_board)
-                    if score < best_score:
-                        best_score = score
-                        winners = [i]
-                    elif score == best_score:
-                        winners.append(i)
-                        
-                # Award wins/ties
-                if len(winners) == 1:
-                    wins[winners[0]] += 1
-                else:
-                    for winner in winners:
-                        ties[winner] += 1
-                    
-            # Calculate equity percentages
-            for i, player_idx in enumerate(active_players):
-                total_equity = (wins[i] + ties[i] / len(active_players)) / simulations * 100
-                equity[player_idx] = total_equity
-                
-            return equity
+        started = time.perf_counter()
+        shown = False
+        if self.pending_equity and self.pending_equity[0] == self._equity_spot():
+            # Usually already finished in the background while guesses were typed
+            _, future, _, latest = self.pending_equity
+            while not future.done():
+                if latest[0] is not None:
+                    self.show_equity_progress(latest[0][1])
+                    shown = True
+                wait([future], timeout=0.1)
+            step = future.result()
+            # Answered, so a later fold must not restart work for this street
+            self.pending_equity = None
         else:
-            # All cards are dealt, calculate exact equity
-            active_players = [i for i in range(self.players) if i not in self.folded_players]
-            if len(active_players) < 2:
-                return {active_players[0]: 100.0} if active_players else {}
-                
-            # Get player hands (already in treys format)
-            player_hands = [self.player_cards[i] for i in active_players]
-            board = self.community_cards
-            
-            # Evaluate each player's hand
-            best_score = float('inf')
-            winners = []
-            
-            for i, hand in enumerate(player_hands):
-                score = self.evaluator.evaluate(hand, board)
-                if score < best_score:
-                    best_score = score
-                    winners = [i]
-                elif score == best_score:
-                    winners.append(i)
-                    
-            # Award equity
-            equity = {}
-            for i, player_idx in enumerate(active_players):
-                if i in winners:
-                    equity[player_idx] = 100.0 / len(winners)
-                else:
-                    equity[player_idx] = 0.0
-                    
-            return equity
+            self.cancel_prefetch()
+            for step in self.iter_equity():
+                if not step[1].exact:
+                    self.show_equity_progress(step[1])
+                    shown = True
+        if shown:
+            sys.stdout.write("\r\033[K")
+            sys.stdout.flush()
+        if self.metrics is not None:
+            self.metrics.record_equity(time.perf_counter() - started)
+        return step[0]
             
     def show_results(self, guesses, true_equity):
         """Show comparison between guesses and true equity with enhanced visuals"""
@@ -317,12 +283,7 @@ class PokerGame:
             guess = guesses.get(i, 0)
             true = true_equity.get(i, 0)
             diff = abs(guess - true)
-            
-            # Calculate accuracy percentage
-            if true > 0:
-                accuracy = max(0, 100 - (diff / true * 100))
-            else:
-                accuracy = 100 if guess == 0 else 0
+            accuracy = guess_accuracy(guess, true)
                 
             total_accuracy += accuracy
             valid_guesses += 1
@@ -355,10 +316,8 @@ class PokerGame:
         time.sleep(0.5)
         
         # Reset game state
-        self.deck = Deck()
-        self.player_cards = []
-        self.community_cards = []
-        self.folded_players = set()
+        self.cancel_prefetch()
+        self.new_hand()
         
     def fold_players(self):
         """Allow user to fold players with enhanced UI"""
@@ -371,26 +330,25 @@ class PokerGame:
             
         print(f"\n{Colors.BOLD}{Colors.YELLOW}🎯 Which players would you like to fold?{Colors.END}")
         print(f"{Colors.CYAN}Enter player numbers separated by spaces, or 'none': {Colors.END}")
-        response = input().strip().lower()
+        response = self.read_input().strip().lower()
         
         if response == 'none':
             return
             
         try:
-            fold_indices = [int(x) - 1 for x in response.split()]
-            for idx in fold_indices:
-                if 0 <= idx < self.players and idx not in self.folded_players:
-                    self.folded_players.add(idx)
-                    print(f"{Colors.RED}❌ {self.player_names[idx]} has been folded{Colors.END}")
-                    time.sleep(0.5)
+            self.fold([int(x) - 1 for x in response.split()])
         except ValueError:
             print(f"{Colors.YELLOW}Invalid input, no players folded{Colors.END}")
+
+        # Restart any background work with the reduced player set
+        if self.pending_equity:
+            self.prefetch_equity()
             
     def ask_play_again(self):
         """Ask if user wants to play another game"""
         print(f"\n{Colors.BOLD}{Colors.CYAN}🎮 Would you like to play another game?{Colors.END}")
         while True:
-            response = input(f"{Colors.YELLOW}Enter 'y' for yes or 'n' for no: {Colors.END}").strip().lower()
+            response = self.read_input(f"{Colors.YELLOW}Enter 'y' for yes or 'n' for no: {Colors.END}").strip().lower()
             if response in ['y', 'yes']:
                 return True
             elif response in ['n', 'no']:
@@ -401,44 +359,60 @@ class PokerGame:
     def show_winner(self):
         """Show the final winner with enhanced visuals"""
         if len(self.community_cards) == 5:
-            equity = self.calculate_equity()
-            winners = [i for i, eq in equity.items() if eq > 0 and i not in self.folded_players]
+            self.showdown()
+
+    def render_showdown(self, winners, best_rank):
+        """Print the final results of a showdown"""
+        print(f"\n{Colors.BOLD}{'='*60}{Colors.END}")
+        print(f"{Colors.BOLD}{Colors.GREEN}{'🏆 FINAL RESULTS 🏆':^60}{Colors.END}")
+        print(f"{Colors.BOLD}{'='*60}{Colors.END}")
+        
+        if winners:
+            if len(winners) == 1:
+                winner = winners[0]
+                print(f"\n{Colors.BOLD}{Colors.GREEN}🎉 {self.player_names[winner]} WINS! 🎉{Colors.END}")
+                hand = self.player_cards[winner]
+                hand_class = self.evaluator.get_rank_class(best_rank)
+                hand_name = self.evaluator.class_to_string(hand_class)
+                print(f"{Colors.CYAN}Winning hand: {Colors.BOLD}{hand_name}{Colors.END}")
+                
+                # Show winning cards
+                winning_cards = ' '.join([self.format_card(card) for card in hand])
+                print(f"{Colors.YELLOW}Winning cards: {winning_cards}{Colors.END}")
+            else:
+                print(f"\n{Colors.BOLD}{Colors.YELLOW}🤝 It's a tie between:{Colors.END}")
+                for winner in winners:
+                    print(f"  {Colors.GREEN}🏆 {self.player_names[winner]}{Colors.END}")
+        else:
+            print(f"\n{Colors.RED}❌ No active players remaining!{Colors.END}")
+                
+    def play_bank(self):
+        """Quiz loop over stored scenarios: nothing is dealt and equity is looked up"""
+        while True:
+            hands, board, answer = self.bank.draw()
+            self.load_position(hands, board)
+            self.player_names = [f"Player {i+1}" for i in range(self.players)]
             
-            print(f"\n{Colors.BOLD}{'='*60}{Colors.END}")
-            print(f"{Colors.BOLD}{Colors.GREEN}{'🏆 FINAL RESULTS 🏆':^60}{Colors.END}")
-            print(f"{Colors.BOLD}{'='*60}{Colors.END}")
+            self.display_game_state(scenarios.STREET_NAMES[len(board)])
+            guesses = self.get_equity_guesses()
+            self.show_results(guesses, dict(enumerate(answer)))
             
-            if winners:
-                if len(winners) == 1:
-                    winner = winners[0]
-                    print(f"\n{Colors.BOLD}{Colors.GREEN}🎉 {self.player_names[winner]} WINS! 🎉{Colors.END}")
-                    # Evaluate winning hand (already in treys format)
-                    hand = self.player_cards[winner]
-                    board = self.community_cards
-                    score = self.evaluator.evaluate(hand, board)
-                    hand_class = self.evaluator.get_rank_class(score)
-                    hand_name = self.evaluator.class_to_string(hand_class)
-                    print(f"{Colors.CYAN}Winning hand: {Colors.BOLD}{hand_name}{Colors.END}")
-                    
-                    # Show winning cards
-                    winning_cards = ' '.join([self.format_card(card) for card in hand])
-                    print(f"{Colors.YELLOW}Winning cards: {winning_cards}{Colors.END}")
-                else:
-                    print(f"\n{Colors.BOLD}{Colors.YELLOW}🤝 It's a tie between:{Colors.END}")
-                    for winner in winners:
-                        print(f"  {Colors.GREEN}🏆 {self.player_names[winner]}{Colors.END}")
-            else:
-                print(f"\n{Colors.RED}❌ No active players remaining!{Colors.END}")
+            if not self.ask_play_again():
+                print(f"\n{Colors.BOLD}{Colors.GREEN}👋 Thanks for playing! Goodbye! 👋{Colors.END}")
+                break
                 
     def play_game(self):
         """Main game loop with enhanced visuals and timing"""
+        if self.bank is not None:
+            self.play_bank()
+            return
+            
         while True:  # Main game loop
             print(f"\n{Colors.BOLD}{Colors.CYAN}{'🎰 WELCOME TO POKER EQUITY GUESSING GAME 🎰':^60}{Colors.END}")
             print(f"{Colors.BOLD}{Colors.CYAN}{'='*60}{Colors.END}")
             time.sleep(1)
             
             self.get_player_count()
-            self.create_deck()
             
             print(f"\n{Colors.BOLD}{Colors.GREEN}🎯 Starting new game with {self.players} players...{Colors.END}")
             time.sleep(1)
@@ -451,6 +425,7 @@ class PokerGame:
             
             # Flop
             self.deal_flop()
+            self.prefetch_equity()
             self.display_game_state("Flop")
             time.sleep(2)  # Give time to process
             
@@ -463,6 +438,7 @@ class PokerGame:
             
             # Turn
             self.deal_turn()
+            self.prefetch_equity()
             self.display_game_state("Turn")
             time.sleep(2)  # Give time to process
             
@@ -475,6 +451,7 @@ class PokerGame:
             
             # River
             self.deal_river()
+            self.prefetch_equity()
             self.display_game_state("River")
             time.sleep(2)  # Give time to process
             
@@ -497,5 +474,33 @@ class PokerGame:
             self.reset_game()
 
 if __name__ == "__main__":
-    game = PokerGame()
-    game.play_game()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Poker equity guessing game")
+    parser.add_argument('--bank', nargs='?', const=scenarios.BANK_PATH, default=None,
+                        help="quiz on positions from a scenario bank (see scenarios.py)")
+    parser.add_argument('--players', type=int, nargs='+', help="drill: bank positions with these player counts")
+    parser.add_argument('--street', nargs='+', choices=scenario_index.STREETS, help="drill: only these streets")
+    parser.add_argument('--max-spread', type=float, default=100, help="drill: largest leader-trailer equity gap")
+    for texture in ('paired', 'monotone', 'connected'):
+        parser.add_argument(f'--{texture}', action='store_true', default=None, help=f"drill: {texture} boards only")
+    parser.add_argument('--metrics', metavar='PATH', help="write per-street timings and counters as JSON on exit")
+    parser.add_argument('--profile', metavar='DIR', help="write a cProfile file per street to this directory")
+    args = parser.parse_args()
+
+    bank = None
+    if args.bank:
+        bank = scenarios.ScenarioBank(args.bank)
+        if args.players or args.street or args.max_spread < 100 or args.paired or args.monotone or args.connected:
+            bank = scenario_index.ScenarioIndex(bank).query(
+                players=args.players, street=args.street, max_spread=args.max_spread,
+                paired=args.paired, monotone=args.monotone, connected=args.connected)
+            if not len(bank):
+                parser.error("no bank positions match these filters")
+    game_metrics = metrics.GameMetrics() if args.metrics else None
+    game = PokerGame(bank=bank, game_metrics=game_metrics, profile_dir=args.profile)
+    try:
+        game.play_game()
+    finally:
+        if game.profiler:
+            game.profiler.stop()
+        if game_metrics is not None:
+            game_metrics.dump(args.metrics)
\ No newline at end of file
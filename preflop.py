@@ -0,0 +1,303 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations, permutations
+
+import numpy as np
+
+import equity
+from cards import CARD_INDEX, CARD_INTS
+from evaluator import evaluate_showdowns, load_tables
+
+TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'preflop_equity.bin')
+
+# File layout: header, 1326x1326 combo matrix, 169x169 class matrix. Equities
+# are stored as uint16 fractions of SCALE; CONFLICT marks combos sharing a card.
+MAGIC = b'EKPF'
+VERSION = 1
+HEADER = np.dtype([('magic', 'S4'), ('version', '<u4'), ('exact', '<u4'), ('samples', '<u4')])
+SCALE = 65534
+CONFLICT = 65535
+
+RANK_CHARS = '23456789TJQKA'
+
+# The 1326 two-card combos as pairs of dense card indices, in index order
+COMBOS = np.array(list(combinations(range(52), 2)), dtype=np.intp)
+COMBO_INDEX = np.full((52, 52), -1, dtype=np.intp)
+COMBO_INDEX[COMBOS[:, 0], COMBOS[:, 1]] = np.arange(len(COMBOS))
+COMBO_INDEX[COMBOS[:, 1], COMBOS[:, 0]] = np.arange(len(COMBOS))
+
+MATCHUP_CHUNK = 250
+
+_board_combos = None
+
+
+def combo_index(hand):
+    """Slot of a two-card treys hand in the 1326 combo order"""
+    return int(COMBO_INDEX[CARD_INDEX[hand[0]], CARD_INDEX[hand[1]]])
+
+
+def _class_of(first, second):
+    """Starting-hand class of two dense card indices in the 13x13 grid
+
+    Pairs sit on the diagonal, suited hands above it (row = high rank) and
+    offsuit hands below it (row = low rank).
+    """
+    high, low = max(first // 4, second // 4), min(first // 4, second // 4)
+    if first % 4 == second % 4:
+        return high * 13 + low
+    return low * 13 + high
+
+
+COMBO_CLASSES = np.array([_class_of(a, b) for a, b in COMBOS], dtype=np.intp)
+
+
+def class_name(index):
+    """Name of a starting-hand class, e.g. 'AKs', 'T9o' or 'QQ'"""
+    row, col = divmod(index, 13)
+    if row == col:
+        return RANK_CHARS[row] * 2
+    if row > col:
+        return RANK_CHARS[row] + RANK_CHARS[col] + 's'
+    return RANK_CHARS[col] + RANK_CHARS[row] + 'o'
+
+
+def class_index(name):
+    """Grid index of a starting-hand class name"""
+    high, low = RANK_CHARS.index(name[0].upper()), RANK_CHARS.index(name[1].upper())
+    if high < low:
+        high, low = low, high
+    if high == low:
+        return high * 13 + high
+    if name[2:].lower() == 's':
+        return high * 13 + low
+    return low * 13 + high
+
+
+def canonical_matchups():
+    """Group the heads-up combo matchups that are equal up to a suit relabeling
+
+    Returns (matchup, flipped, representatives): matchup[i, j] is the id of
+    the class of combo i against combo j (-1 when they share a card),
+    flipped[i, j] is set when combo i plays the second seat of that class's
+    representative, and representatives lists one (combo, combo) per class.
+    """
+    relabeled = []
+    for perm in permutations(range(4)):
+        cards = np.array([(card // 4) * 4 + perm[card % 4] for card in range(52)])
+        relabeled.append(COMBO_INDEX[cards[COMBOS[:, 0]], cards[COMBOS[:, 1]]])
+
+    ordered = np.full((len(COMBOS), len(COMBOS)), np.iinfo(np.int64).max, dtype=np.int64)
+    for combos in relabeled:
+        combos = combos.astype(np.int64)
+        np.minimum(ordered, combos[:, None] * len(COMBOS) + combos[None, :], out=ordered)
+
+    # Seat order does not matter heads-up: B vs A is 100% minus A vs B
+    flipped = ordered.T < ordered
+    keys = np.minimum(ordered, ordered.T)
+
+    conflict = np.zeros(ordered.shape, dtype=bool)
+    for i in range(2):
+        for j in range(2):
+            conflict |= COMBOS[:, i][:, None] == COMBOS[:, j][None, :]
+
+    unique, inverse = np.unique(keys[~conflict], return_inverse=True)
+    matchup = np.full(ordered.shape, -1, dtype=np.intp)
+    matchup[~conflict] = inverse
+    representatives = [divmod(int(key), len(COMBOS)) for key in unique]
+    return matchup, flipped, representatives
+
+
+def _combo_hand(combo):
+    """Treys card ints for a combo slot"""
+    return [CARD_INTS[card] for card in COMBOS[combo]]
+
+
+def _all_boards():
+    """Every 5-card subset of 48 live cards, as positions into the live list"""
+    global _board_combos
+    if _board_combos is None:
+        _board_combos = np.array(list(combinations(range(48), 5)), dtype=np.uint8)
+    return _board_combos
+
+
+def _matchup_equities(representatives, first, samples, entropy):
+    """Worker task: first-seat equity fraction for each representative matchup
+
+    samples=0 enumerates all 1,712,304 boards; otherwise each matchup draws
+    `samples` runouts from its own RNG stream.
+    """
+    results = []
+    for offset, (a, b) in enumerate(representatives):
+        hands = [_combo_hand(a), _combo_hand(b)]
+        if samples:
+            rng = np.random.default_rng(np.random.SeedSequence(entropy, spawn_key=(first + offset,)))
+            shares, _ = equity.vectorized_shares(hands, [], samples, rng)
+            pots = samples
+        else:
+            hand_indices = COMBOS[[a, b]]
+            live = np.setdiff1d(np.arange(52), hand_indices.ravel())
+            boards = _all_boards()
+            shares = np.zeros(2, dtype=np.int64)
+            for start in range(0, len(boards), equity.BATCH_SIZE * 10):
+                chunk = live[boards[start:start + equity.BATCH_SIZE * 10]]
+                shares += equity.board_shares(evaluate_showdowns(hand_indices, chunk)).sum(axis=1)
+            pots = len(boards)
+        results.append(shares[0] / (pots * equity.POT_UNITS))
+    return results
+
+
+def build_table(path=TABLE_PATH, samples=0, workers=None, seed=None):
+    """Compute every heads-up combo matchup in parallel and write the table
+
+    samples=0 (the default) enumerates every board, so stored equities are
+    exact; a positive count samples that many runouts per matchup instead.
+    """
+    started = time.perf_counter()
+    matchup, flipped, representatives = canonical_matchups()
+    print(f"{len(representatives)} suit-isomorphic matchups, "
+          f"{'exact' if not samples else f'{samples} samples each'}")
+
+    entropy = np.random.SeedSequence(seed).entropy
+    chunks = range(0, len(representatives), MATCHUP_CHUNK)
+    values = np.empty(len(representatives))
+    with ProcessPoolExecutor(max_workers=workers, initializer=load_tables) as pool:
+        futures = [
+            pool.submit(_matchup_equities, representatives[first:first + MATCHUP_CHUNK], first, samples, entropy)
+            for first in chunks
+        ]
+        for first, future in zip(chunks, futures):
+            result = future.result()
+            values[first:first + len(result)] = result
+            print(f"  {first + len(result)}/{len(representatives)} matchups", end='\r')
+    print()
+
+    valid = matchup >= 0
+    # A class that a suit relabeling maps onto its own seat swap, such as
+    # 2s3s vs 2h3h, is flipped in neither direction; both seats hold
+    # equivalent hands, so its equity is exactly one half even when sampled
+    mirrored = valid & ~flipped & ~flipped.T
+    values[np.unique(matchup[mirrored])] = 0.5
+
+    combo_equity = np.zeros(matchup.shape)
+    combo_equity[valid] = values[matchup[valid]]
+    combo_equity[valid & flipped] = 1 - combo_equity[valid & flipped]
+
+    # A class matchup is the average over its non-conflicting combo matchups
+    membership = np.zeros((169, len(COMBOS)))
+    membership[COMBO_CLASSES, np.arange(len(COMBOS))] = 1
+    totals = membership @ combo_equity @ membership.T
+    counts = membership @ valid.astype(float) @ membership.T
+    class_equity = totals / counts
+
+    combo_table = np.full(matchup.shape, CONFLICT, dtype='<u2')
+    combo_table[valid] = np.rint(combo_equity[valid] * SCALE)
+    class_table = np.rint(class_equity * SCALE).astype('<u2')
+
+    header = np.array([(MAGIC, VERSION, int(not samples), samples)], dtype=HEADER)
+    with open(path, 'wb') as f:
+        f.write(header.tobytes())
+        f.write(combo_table.tobytes())
+        f.write(class_table.tobytes())
+    print(f"Wrote {path} in {time.perf_counter() - started:.1f}s")
+
+
+class PreflopTable:
+    """Memory-mapped heads-up preflop equities for combos and hand classes"""
+
+    def __init__(self, path=TABLE_PATH):
+        header = np.fromfile(path, dtype=HEADER, count=1)
+        if len(header) != 1 or header[0]['magic'] != MAGIC or header[0]['version'] != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} preflop equity table")
+        self.path = path
+        self.exact = bool(header[0]['exact'])
+        self.samples = int(header[0]['samples'])
+        offset = HEADER.itemsize
+        self.combos = np.memmap(path, dtype='<u2', mode='r', offset=offset, shape=(len(COMBOS), len(COMBOS)))
+        offset += self.combos.nbytes
+        self.classes = np.memmap(path, dtype='<u2', mode='r', offset=offset, shape=(169, 169))
+
+    def hand_equity(self, hand, other):
+        """Equity percentage of one two-card hand against another"""
+        value = int(self.combos[combo_index(hand), combo_index(other)])
+        if value == CONFLICT:
+            raise ValueError("Hands share a card")
+        return value / SCALE * 100
+
+    def class_equity(self, name, other):
+        """Equity percentage of one starting-hand class against another, e.g. 'AKs' vs 'QQ'"""
+        return int(self.classes[class_index(name), class_index(other)]) / SCALE * 100
+
+    def solve_equity(self, hands):
+        """EquityResult for a heads-up preflop matchup"""
+        first = self.hand_equity(hands[0], hands[1])
+        shares = [first, 100 - first]
+        if self.exact:
+            return equity.EquityResult(shares, self.samples, [0.0, 0.0], exact=True)
+        stderr = [(share * (100 - share) / self.samples) ** 0.5 for share in shares]
+        return equity.EquityResult(shares, self.samples, stderr)
+
+
+def load_table(path=TABLE_PATH):
+    """The preflop table at path, or None if it has not been generated"""
+    if not os.path.exists(path):
+        return None
+    return PreflopTable(path)
+
+
+def verify_table(table, checks=200, samples=20000, seed=None):
+    """Compare random table entries against fresh simulations; True if all agree
+
+    Every entry is also checked against its seat swap: A vs B and B vs A
+    must add up to 100%.
+    """
+    combos = np.asarray(table.combos, dtype=np.int64)
+    valid = combos != CONFLICT
+    unbalanced = int(np.count_nonzero(valid & (combos + combos.T != SCALE)))
+    if unbalanced:
+        print(f"  {unbalanced} combo matchups do not add up to 100% with their seat swap")
+
+    rng = np.random.default_rng(seed)
+    failures = 0
+    worst = 0.0
+    for _ in range(checks):
+        first, second = rng.choice(len(COMBOS), 2, replace=False)
+        if set(COMBOS[first]) & set(COMBOS[second]):
+            continue
+        hands = [_combo_hand(first), _combo_hand(second)]
+        stored = table.solve_equity(hands)
+        sampled = equity.sampled_result(*equity.vectorized_shares(hands, [], samples, rng), samples)
+        diff = abs(stored.equity[0] - sampled.equity[0])
+        # Allow four standard errors of the two estimates combined
+        allowed = 4 * (stored.stderr[0] ** 2 + sampled.stderr[0] ** 2) ** 0.5 + 100 / SCALE
+        worst = max(worst, diff)
+        if diff > allowed:
+            failures += 1
+            print(f"  {class_name(COMBO_CLASSES[first])} vs {class_name(COMBO_CLASSES[second])}: "
+                  f"table {stored.equity[0]:.2f}%, sampled {sampled.equity[0]:.2f}%")
+    print(f"Checked {checks} matchups, largest difference {worst:.2f}%, {failures} outside tolerance")
+    return failures == 0 and not unbalanced
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or verify the heads-up preflop equity table")
+    parser.add_argument('command', choices=['build', 'verify'])
+    parser.add_argument('--output', default=TABLE_PATH, help="table file path")
+    parser.add_argument('--samples', type=int, default=0,
+                        help="sample this many runouts per matchup instead of enumerating every board; "
+                             "the table is then approximate (default: 0, exact)")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--seed', type=int, default=None, help="master seed for reproducible tables")
+    parser.add_argument('--checks', type=int, default=200, help="matchups to re-simulate when verifying")
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        build_table(args.output, args.samples, args.workers, args.seed)
+    ok = verify_table(PreflopTable(args.output), args.checks, seed=args.seed)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
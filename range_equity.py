@@ -0,0 +1,291 @@
+import argparse
+import sys
+import time
+from itertools import combinations
+from math import comb
+
+import numpy as np
+from treys import Card
+
+import equity
+from cards import CARD_INTS, card_indices, indices_mask, live_indices, row_masks
+from evaluator import NO_FLUSH, evaluate_showdowns
+from preflop import COMBOS, combo_index
+from ranges import COMBO_MASKS, HandRange, parse_range
+
+# Heads-up spots with at most this many runouts are enumerated exactly
+EXACT_RUNOUTS = 2000
+
+# Sampling: runouts ranked per batch, joint combo deals drawn on each
+# runout, and the accepted deals needed by default
+RUNOUT_BATCH = 250
+DEALS_PER_RUNOUT = 40
+DEFAULT_SAMPLES = 200000
+
+# Draws without one conflict-free deal before the ranges count as incompatible
+MAX_REJECTED = 1000000
+
+# Sort keys pack (runout, card group, rank); every treys rank is below this
+RANK_STRIDE = NO_FLUSH + 1
+
+# Runouts whose villain combos are sorted together in exact enumeration
+RUNOUT_CHUNK = 64
+
+
+def range_weights(hand_range):
+    """1326-slot weight array for a range
+
+    hand_range is range notation (see ranges.parse_range), a HandRange, a
+    weight array in preflop.COMBOS order, or an iterable of two-card treys
+    hands or (hand, weight) pairs.
+    """
+    if isinstance(hand_range, str):
+        hand_range = parse_range(hand_range)
+    if isinstance(hand_range, HandRange):
+        return hand_range.weights.astype(float)
+    if isinstance(hand_range, np.ndarray):
+        if hand_range.shape != (len(COMBOS),):
+            raise ValueError(f"A range array needs {len(COMBOS)} combo weights")
+        return hand_range.astype(float)
+    weights = np.zeros(len(COMBOS))
+    for item in hand_range:
+        hand, weight = (item, 1.0) if isinstance(item[0], int) else item
+        weights[combo_index(hand)] = weight
+    return weights
+
+
+class RangeEquityResult(equity.EquityResult):
+    """Equity of each seat's range, overall and for every combo in it
+
+    combo_equity is a (seats, 1326) array of percentages (NaN for combos a
+    seat never holds) and combo_weights the share of each seat's weight that
+    falls on each combo once card removal is accounted for.
+    """
+
+    def __init__(self, equity, samples, stderr, combo_equity, combo_weights, exact=False):
+        super().__init__(equity, samples, stderr, exact)
+        self.combo_equity = combo_equity
+        self.combo_weights = combo_weights
+
+    def combos(self, seat):
+        """(hand, weight, equity) for each combo a seat can hold, best first"""
+        held = np.flatnonzero(self.combo_weights[seat] > 0)
+        held = held[np.argsort(-self.combo_equity[seat, held], kind='stable')]
+        return [([CARD_INTS[card] for card in COMBOS[combo]], float(self.combo_weights[seat, combo]),
+                 float(self.combo_equity[seat, combo])) for combo in held]
+
+
+def _sums_below(keys, weights):
+    """Function giving, for query keys, the total weight of entries with a smaller key"""
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    cumulative = np.concatenate([[0.0], np.cumsum(weights[order])])
+    return lambda queries: cumulative[np.searchsorted(sorted_keys, queries)]
+
+
+def _versus(hero, villain, hero_ranks, villain_ranks, villain_weights):
+    """Villain weight that beats, ties and faces each hero combo on each runout
+
+    Ranks are (runouts, combos) arrays and villain_weights already zero on
+    runouts that hold a villain card. Villain combos are sorted by rank once
+    per runout, so each hero combo costs a few binary searches; combos
+    sharing a card with the hero are removed by subtracting the sums over
+    its two cards' groups (the identical combo is added back by the caller).
+    """
+    runouts = np.arange(len(hero_ranks))[:, None]
+    below = _sums_below((runouts * RANK_STRIDE + villain_ranks).ravel(), villain_weights.ravel())
+    # Group (runout, card) holds the villain combos containing that card
+    card_groups = (runouts[:, :, None] * 52 + COMBOS[villain][None, :, :]) * RANK_STRIDE
+    card_below = _sums_below((card_groups + villain_ranks[:, :, None]).ravel(),
+                             np.repeat(villain_weights.ravel(), 2))
+    group_bounds = card_below((runouts * 52 + np.arange(53)) * RANK_STRIDE)
+
+    start = runouts * RANK_STRIDE
+    at_rank = below(start + hero_ranks)
+    better = at_rank - below(start)
+    tied = below(start + hero_ranks + 1) - at_rank
+    total = np.broadcast_to(below(start + RANK_STRIDE) - below(start), hero_ranks.shape)
+    for card in COMBOS[hero].T:
+        start = (runouts * 52 + card) * RANK_STRIDE
+        group_start = group_bounds[runouts, card]
+        at_rank = card_below(start + hero_ranks)
+        better = better - (at_rank - group_start)
+        tied = tied - (card_below(start + hero_ranks + 1) - at_rank)
+        total = total - (group_bounds[runouts, card + 1] - group_start)
+    return better, tied, total
+
+
+def _tally(hero, villain, hero_ranks, villain_ranks, hero_valid, villain_weights):
+    """Pot shares won and weight faced by each hero combo, summed over runouts in chunks"""
+    position = np.full(len(COMBOS), -1)
+    position[villain] = np.arange(len(villain))
+    same = position[hero]
+    shared = same >= 0
+
+    won = np.zeros(len(hero))
+    faced = np.zeros(len(hero))
+    # Chunks keep the sorted keys small enough to stay in cache
+    for first in range(0, len(hero_ranks), RUNOUT_CHUNK):
+        rows = slice(first, first + RUNOUT_CHUNK)
+        better, tied, total = _versus(hero, villain, hero_ranks[rows], villain_ranks[rows], villain_weights[rows])
+        tied[:, shared] += villain_weights[rows][:, same[shared]]
+        total[:, shared] += villain_weights[rows][:, same[shared]]
+        won += np.where(hero_valid[rows], total - better - tied / 2, 0.0).sum(axis=0)
+        faced += np.where(hero_valid[rows], total, 0.0).sum(axis=0)
+    return won, faced
+
+
+def _exact_heads_up(weights, board, removed):
+    """Exact heads-up result over every runout and every pair of compatible combos"""
+    live = live_indices(removed)
+    runouts = list(combinations(live, 5 - len(board)))
+    runouts = np.array(runouts, dtype=np.intp).reshape(len(runouts), 5 - len(board))
+    boards = np.hstack([np.broadcast_to(board, (len(runouts), len(board))), runouts]).astype(np.intp)
+
+    held = [np.flatnonzero(seat_weights) for seat_weights in weights]
+    played = np.union1d(*held)
+    # Each combo is ranked once per runout and shared by both seats
+    valid = (COMBO_MASKS[played][None, :] & row_masks(runouts)[:, None]) == 0
+    ranks = evaluate_showdowns(COMBOS[played], boards, valid.T).T
+    columns = [np.searchsorted(played, combos) for combos in held]
+
+    combo_equity = np.full((2, len(COMBOS)), np.nan)
+    combo_weights = np.zeros((2, len(COMBOS)))
+    totals = []
+    for seat, other in ((0, 1), (1, 0)):
+        hero, villain = held[seat], held[other]
+        villain_weights = weights[other][villain][None, :] * valid[:, columns[other]]
+        won, faced = _tally(hero, villain, ranks[:, columns[seat]], ranks[:, columns[other]],
+                             valid[:, columns[seat]], villain_weights)
+        reach = weights[seat][hero] * faced
+        if not reach.sum():
+            raise ValueError("The ranges have no compatible combos")
+        reached = faced > 0
+        combo_equity[seat, hero[reached]] = won[reached] / faced[reached] * 100
+        combo_weights[seat, hero] = reach / reach.sum()
+        totals.append(float((weights[seat][hero] * won).sum() / reach.sum() * 100))
+    return RangeEquityResult(totals, len(runouts), [0.0, 0.0], combo_equity, combo_weights, exact=True)
+
+
+def _sampled(weights, board, removed, samples, rng):
+    """Monte Carlo result from conflict-free joint deals on sampled runouts"""
+    needed = 5 - len(board)
+    sampler = equity.LiveCardSampler(live_indices(removed), rng)
+    held = [np.flatnonzero(seat_weights) for seat_weights in weights]
+    cumulative = [np.cumsum(seat_weights[combos]) for seat_weights, combos in zip(weights, held)]
+    played = np.unique(np.concatenate(held))
+    column = np.full(len(COMBOS), -1)
+    column[played] = np.arange(len(played))
+
+    seats = len(weights)
+    shares = np.zeros(seats)
+    # Deals on one runout are correlated, so the error is estimated from
+    # per-runout totals: sums of share^2, share * deals and deals^2
+    moments = np.zeros((3, seats))
+    runouts_used = 0
+    combo_shares = np.zeros((seats, len(COMBOS)))
+    combo_counts = np.zeros((seats, len(COMBOS)))
+    accepted = rejected = 0
+    while accepted < samples:
+        runouts = sampler.sample(needed, RUNOUT_BATCH)
+        boards = np.hstack([np.broadcast_to(board, (RUNOUT_BATCH, len(board))), runouts]).astype(np.intp)
+        runout_masks = row_masks(runouts)
+        # Each combo is ranked once per runout and shared by every seat and deal
+        valid = (COMBO_MASKS[played][:, None] & runout_masks[None, :]) == 0
+        ranks = evaluate_showdowns(COMBOS[played], boards, valid).T
+
+        used = np.repeat(runout_masks[:, None], DEALS_PER_RUNOUT, axis=1)
+        ok = np.ones(used.shape, dtype=bool)
+        picks = []
+        for combos, weight_sums in zip(held, cumulative):
+            pick = combos[np.searchsorted(weight_sums, rng.random(used.shape) * weight_sums[-1], side='right')]
+            mask = COMBO_MASKS[pick]
+            ok &= (used & mask) == 0
+            used |= mask
+            picks.append(pick)
+
+        rows = np.nonzero(ok)
+        if not len(rows[0]):
+            rejected += ok.size
+            if rejected >= MAX_REJECTED and not accepted:
+                raise ValueError("The ranges have no compatible combos")
+            continue
+        picks = np.stack(picks)[:, rows[0], rows[1]]
+        won = equity.board_shares(ranks[rows[0][None, :], column[picks]]).astype(float)
+        shares += won.sum(axis=1)
+        runout_shares = np.stack([np.bincount(rows[0], seat_won, minlength=RUNOUT_BATCH) for seat_won in won])
+        runout_deals = np.bincount(rows[0], minlength=RUNOUT_BATCH)
+        moments[0] += (runout_shares ** 2).sum(axis=1)
+        moments[1] += (runout_shares * runout_deals).sum(axis=1)
+        moments[2] += (runout_deals ** 2).sum()
+        runouts_used += RUNOUT_BATCH
+        for seat in range(seats):
+            combo_shares[seat] += np.bincount(picks[seat], won[seat], minlength=len(COMBOS))
+            combo_counts[seat] += np.bincount(picks[seat], minlength=len(COMBOS))
+        accepted += picks.shape[1]
+
+    mean = shares / accepted
+    spread = np.maximum(moments[0] - 2 * mean * moments[1] + mean * mean * moments[2], 0.0)
+    stderr = np.sqrt(spread * runouts_used / max(runouts_used - 1, 1)) / accepted / equity.POT_UNITS * 100
+    with np.errstate(invalid='ignore', divide='ignore'):
+        combo_equity = np.where(combo_counts > 0, combo_shares / combo_counts / equity.POT_UNITS * 100, np.nan)
+    return RangeEquityResult(equity.shares_to_equity(shares.tolist(), accepted), accepted, stderr.tolist(),
+                             combo_equity, combo_counts / accepted)
+
+
+def range_equity(ranges, board=(), dead=(), samples=DEFAULT_SAMPLES, rng=None):
+    """Equity of each seat's weighted range against the others
+
+    ranges holds one range per seat (see range_weights); board and dead
+    are treys cards. Combos holding a board or dead card are dropped and
+    seats never share a card. Heads-up spots on the flop or later are
+    enumerated exactly; otherwise `samples` joint deals are sampled.
+    """
+    if len(ranges) < 2:
+        raise ValueError("Range equity needs at least two seats")
+    board = card_indices(board)
+    dead = card_indices(dead)
+    removed = indices_mask(board) | indices_mask(dead)
+    conflicts = (COMBO_MASKS & np.uint64(removed)) != 0
+    weights = []
+    for hand_range in ranges:
+        seat_weights = range_weights(hand_range)
+        seat_weights[conflicts] = 0
+        if not (seat_weights > 0).any():
+            raise ValueError("Every seat needs a combo that does not use a board or dead card")
+        weights.append(np.maximum(seat_weights, 0))
+
+    runouts = comb(52 - len(board) - len(dead), 5 - len(board))
+    if len(weights) == 2 and runouts <= EXACT_RUNOUTS:
+        return _exact_heads_up(weights, board, removed)
+    return _sampled(weights, board, removed, samples, rng or np.random.default_rng())
+
+
+def _parse_cards(text):
+    """Treys ints for concatenated card text such as 'AhKd7c'"""
+    return [Card.new(text[i:i + 2]) for i in range(0, len(text), 2)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Equity of hand ranges against each other")
+    parser.add_argument('ranges', nargs='+', help="one range per seat in range notation, e.g. 'QQ+,AKs' or AhAd")
+    parser.add_argument('--board', default='', help="board cards, e.g. Ah7c2d")
+    parser.add_argument('--samples', type=int, default=DEFAULT_SAMPLES, help="joint deals when sampling")
+    parser.add_argument('--top', type=int, default=5, help="combos to list per seat")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    result = range_equity(args.ranges, _parse_cards(args.board), samples=args.samples)
+    elapsed = time.perf_counter() - started
+    kind = 'exact' if result.exact else f"{result.samples:,} samples"
+    print(f"Solved in {elapsed * 1000:.0f} ms ({kind})")
+    for seat, (text, share, margin) in enumerate(zip(args.ranges, result.equity, result.margins())):
+        print(f"Seat {seat + 1}: {share:6.2f}% ±{margin:.2f}  {text}")
+        for hand, weight, combo_share in result.combos(seat)[:args.top]:
+            print(f"    {Card.int_to_str(hand[0])}{Card.int_to_str(hand[1])} {combo_share:6.2f}%  "
+                  f"({weight:.1%} of the range)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+import re
+import sys
+from functools import lru_cache
+
+import numpy as np
+from treys import Card
+
+from cards import CARD_INTS, cards_mask, row_masks
+from preflop import COMBO_CLASSES, COMBOS, RANK_CHARS, combo_index
+
+# Card bits of each of the 1326 combos, in preflop.COMBOS order
+COMBO_MASKS = row_masks(COMBOS)
+
+# Distinct range strings whose compiled weights are kept
+PARSE_CACHE_SIZE = 1024
+
+_CLASS = re.compile(r'([2-9TJQKA])([2-9TJQKA])([so]?)$', re.IGNORECASE)
+_COMBO = re.compile(r'([2-9TJQKA][shdc])([2-9TJQKA][shdc])$', re.IGNORECASE)
+
+
+def _hand_class(text):
+    """(high rank, low rank, 's', 'o' or '') of a class such as 'AKs', 'T9' or 'QQ'"""
+    match = _CLASS.match(text)
+    if not match:
+        raise ValueError(f"Not a hand class: {text!r}")
+    high, low = sorted((RANK_CHARS.index(match.group(1).upper()), RANK_CHARS.index(match.group(2).upper())),
+                       reverse=True)
+    kind = match.group(3).lower()
+    if high == low and kind:
+        raise ValueError(f"Pairs are neither suited nor offsuit: {text!r}")
+    return high, low, kind
+
+
+def _grid_slots(high, low, kind):
+    """Starting-hand grid indices (see preflop.class_index) of one rank pair"""
+    if high == low:
+        return [high * 13 + high]
+    return [slot for slot, wanted in ((high * 13 + low, 's'), (low * 13 + high, 'o')) if kind in ('', wanted)]
+
+
+def _token_slots(token):
+    """Grid indices named by one range token without its weight"""
+    if token.endswith('+'):
+        high, low, kind = _hand_class(token[:-1])
+        if high == low:
+            pairs = [(rank, rank) for rank in range(high, 13)]
+        else:
+            pairs = [(high, kicker) for kicker in range(low, high)]
+    elif '-' in token:
+        (high, low, kind), (last_high, last_low, last_kind) = map(_hand_class, token.split('-', 1))
+        if kind != last_kind:
+            raise ValueError(f"Both ends of {token!r} must be the same kind of hand")
+        if high == low and last_high == last_low:
+            pairs = [(rank, rank) for rank in range(min(high, last_high), max(high, last_high) + 1)]
+        elif high == last_high:
+            pairs = [(high, kicker) for kicker in range(min(low, last_low), max(low, last_low) + 1)]
+        elif high - low == last_high - last_low:
+            gap = high - low
+            pairs = [(rank, rank - gap) for rank in range(min(high, last_high), max(high, last_high) + 1)]
+        else:
+            raise ValueError(f"{token!r} is not a pair, kicker or connector range")
+    else:
+        return _grid_slots(*_hand_class(token))
+    return [slot for high, low in pairs for slot in _grid_slots(high, low, kind)]
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _compile(text):
+    """Read-only 1326-slot weights for range notation; later tokens override earlier ones"""
+    weights = np.zeros(len(COMBOS))
+    for token in filter(None, (part.strip() for part in text.split(','))):
+        token, _, weight = token.partition(':')
+        weight = float(weight) if weight else 1.0
+        if not 0 <= weight <= 1:
+            raise ValueError(f"Weights must be between 0 and 1: {token}:{weight}")
+        token = token.strip()
+        combo = _COMBO.match(token)
+        if combo:
+            first, second = (Card.new(card[0].upper() + card[1].lower()) for card in combo.groups())
+            if first == second:
+                raise ValueError(f"Not a two-card combo: {token!r}")
+            weights[combo_index([first, second])] = weight
+            continue
+        selected = np.zeros(169, dtype=bool)
+        selected[_token_slots(token)] = True
+        weights[selected[COMBO_CLASSES]] = weight
+    weights.setflags(write=False)
+    return weights
+
+
+class HandRange:
+    """Weights of the 1326 two-card combos in preflop.COMBOS order
+
+    Ranges are values: the set operations and blocker removal work on whole
+    arrays and return new ranges. mask is the bitset of combos with weight.
+    """
+
+    def __init__(self, weights):
+        weights = np.asarray(weights, dtype=float)
+        if weights.shape != (len(COMBOS),):
+            raise ValueError(f"A range needs {len(COMBOS)} combo weights")
+        if weights.flags.writeable:
+            weights = weights.copy()
+            weights.setflags(write=False)
+        self.weights = weights
+
+    @property
+    def mask(self):
+        return self.weights > 0
+
+    def __len__(self):
+        return int(np.count_nonzero(self.weights))
+
+    def __or__(self, other):
+        """Union, keeping the larger weight of each combo"""
+        return HandRange(np.maximum(self.weights, other.weights))
+
+    def __and__(self, other):
+        """Intersection, keeping the smaller weight of each combo"""
+        return HandRange(np.minimum(self.weights, other.weights))
+
+    def __sub__(self, other):
+        """Combos of this range that are not in other"""
+        return HandRange(np.where(other.mask, 0.0, self.weights))
+
+    def __eq__(self, other):
+        return isinstance(other, HandRange) and np.array_equal(self.weights, other.weights)
+
+    def scaled(self, factor):
+        """The range with every weight multiplied by factor"""
+        return HandRange(self.weights * factor)
+
+    def without(self, cards):
+        """The range without combos blocked by the given treys cards (board or dead cards)"""
+        return HandRange(np.where((COMBO_MASKS & np.uint64(cards_mask(cards))) != 0, 0.0, self.weights))
+
+    def fraction(self):
+        """Share of all 1326 combos held, counting partial weights"""
+        return float(self.weights.sum() / len(COMBOS))
+
+    def combos(self):
+        """(hand, weight) for each combo with weight, hands as treys ints"""
+        return [([CARD_INTS[card] for card in COMBOS[combo]], float(self.weights[combo]))
+                for combo in np.flatnonzero(self.weights)]
+
+
+def parse_range(text):
+    """HandRange for notation such as '22+, A2s+, KTo+, 76s-54s, AhKh, QJs:0.5'
+
+    Tokens are separated by commas and may end in ':weight' (0 to 1).
+    Compiled weights are cached, so repeated strings are not reparsed.
+    """
+    return HandRange(_compile(' '.join(text.split())))
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print("Usage: python ranges.py RANGE [BOARD]")
+        return 1
+    hand_range = parse_range(argv[0])
+    if len(argv) > 1:
+        board = argv[1]
+        hand_range = hand_range.without([Card.new(board[i:i + 2]) for i in range(0, len(board), 2)])
+    print(f"{len(hand_range)} combos, {hand_range.fraction():.1%} of all hands")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+import os
+import sys
+import time
+
+import numpy as np
+from treys.lookup import LookupTable
+
+from evaluator import CARD_KEYS, CARD_SUIT_BITS, rank_hands
+from scenarios import HEADER, RECORD, SCALE, ScenarioBank
+
+STREETS = ('flop', 'turn', 'river')
+
+# Board texture bits
+PAIRED = 1
+MONOTONE = 2
+CONNECTED = 4
+
+# Equity spread between the leader and the trailer, in 5-point buckets
+SPREAD_STEP = 5
+SPREAD_BUCKETS = 100 // SPREAD_STEP
+
+# Made-hand classes as in treys: 1 = straight flush ... 9 = high card
+CLASS_LIMITS = np.array([
+    LookupTable.MAX_STRAIGHT_FLUSH, LookupTable.MAX_FOUR_OF_A_KIND, LookupTable.MAX_FULL_HOUSE,
+    LookupTable.MAX_FLUSH, LookupTable.MAX_STRAIGHT, LookupTable.MAX_THREE_OF_A_KIND,
+    LookupTable.MAX_TWO_PAIR, LookupTable.MAX_PAIR, LookupTable.MAX_HIGH_CARD,
+])
+CLASS_NUMBERS = {LookupTable.RANK_CLASS_TO_STRING[number]: number for number in range(1, 10)}
+
+# Every row falls in one bucket per combination of these dimensions:
+# players, street, texture, spread and (leader class, runner-up class)
+DIMENSIONS = (9, len(STREETS), 8, SPREAD_BUCKETS, 81)
+BUCKETS = int(np.prod(DIMENSIONS))
+
+# Records whose features are computed together when the index is built
+FEATURE_CHUNK = 100000
+
+
+def _made_classes(hands, boards, board_sizes):
+    """Made-hand class (1-9) of each row's two hole cards on its board"""
+    classes = np.zeros(len(hands), dtype=np.intp)
+    for size in (3, 4, 5):
+        rows = board_sizes == size
+        cards = np.concatenate([hands[rows], boards[rows, :size]], axis=1).astype(np.intp)
+        ranks = rank_hands(CARD_KEYS[cards].sum(axis=1), CARD_SUIT_BITS[cards].sum(axis=1), size + 2)
+        classes[rows] = np.searchsorted(CLASS_LIMITS, ranks) + 1
+    return classes
+
+
+def _textures(boards, board_sizes):
+    """PAIRED, MONOTONE and CONNECTED bits of each board"""
+    valid = np.arange(5) < board_sizes[:, None]
+    ranks = np.where(valid, boards // 4, 13)
+    present = np.zeros((len(boards), 14), dtype=np.int64)
+    np.add.at(present, (np.arange(len(boards))[:, None], ranks), 1)
+    counts = present[:, :13]
+
+    texture = np.where(counts.max(axis=1) >= 2, PAIRED, 0)
+    flop_suits = boards[:, :3] % 4
+    texture |= np.where((flop_suits == flop_suits[:, :1]).all(axis=1), MONOTONE, 0)
+
+    # Three distinct ranks within five consecutive ones, the ace also low
+    ladder = np.concatenate([counts[:, 12:13], counts], axis=1) > 0
+    windows = np.cumsum(np.pad(ladder, ((0, 0), (1, 0))), axis=1)
+    texture |= np.where(((windows[:, 5:] - windows[:, :-5]) >= 3).any(axis=1), CONNECTED, 0)
+    return texture
+
+
+def bucket_keys(records):
+    """Bucket of each scenario record"""
+    players = records['players'].astype(np.intp)
+    board_sizes = records['board_size'].astype(np.intp)
+    boards = records['board'].astype(np.intp)
+
+    seated = np.arange(10) < players[:, None]
+    equities = records['equity'].astype(np.int64)
+    ranked = np.argsort(np.where(seated, -equities, 1), axis=1, kind='stable')
+    rows = np.arange(len(records))
+    leader, runner_up = ranked[:, 0], ranked[:, 1]
+    spread = (equities[rows, leader] - np.where(seated, equities, SCALE).min(axis=1)) / SCALE * 100
+    spread_bucket = np.minimum(spread // SPREAD_STEP, SPREAD_BUCKETS - 1).astype(np.intp)
+
+    hands = records['hands']
+    leader_class = _made_classes(hands[rows, leader], boards, board_sizes)
+    runner_up_class = _made_classes(hands[rows, runner_up], boards, board_sizes)
+
+    key = players - 2
+    key = key * DIMENSIONS[1] + board_sizes - 3
+    key = key * DIMENSIONS[2] + _textures(boards, board_sizes)
+    key = key * DIMENSIONS[3] + spread_bucket
+    key = key * DIMENSIONS[4] + (leader_class - 1) * 9 + runner_up_class - 1
+    return key.astype(np.uint32)
+
+
+def _choices(value, allowed):
+    """Positions in `allowed` selected by None (all), one value or an iterable of values"""
+    if value is None:
+        return list(range(len(allowed)))
+    if isinstance(value, (str, int)):
+        value = [value]
+    return [allowed.index(item) for item in value]
+
+
+def _class_numbers(value):
+    """Hand class numbers for class names or numbers, keeping None"""
+    if value is None or isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        return CLASS_NUMBERS[value]
+    return [CLASS_NUMBERS.get(item, item) for item in value]
+
+
+class ScenarioQuery:
+    """Scenarios matching one query, sampled in O(log buckets) without scanning rows"""
+
+    def __init__(self, index, buckets):
+        starts = index.offsets[buckets]
+        counts = index.offsets[buckets + 1] - starts
+        keep = counts > 0
+        self.index = index
+        self.starts = starts[keep]
+        self.cumulative = np.cumsum(counts[keep])
+        self.count = int(self.cumulative[-1]) if len(self.cumulative) else 0
+
+    def __len__(self):
+        return self.count
+
+    def sample_many(self, size, rng=None):
+        """Bank indices of `size` matching scenarios drawn uniformly with replacement"""
+        if not self.count:
+            raise ValueError("No scenarios match this query")
+        rng = rng or np.random.default_rng()
+        picks = rng.integers(self.count, size=size)
+        bucket = np.searchsorted(self.cumulative, picks, side='right')
+        before = np.where(bucket > 0, self.cumulative[bucket - 1], 0)
+        return self.index.order[self.starts[bucket] + picks - before]
+
+    def sample(self, rng=None):
+        """Bank index of one matching scenario"""
+        return int(self.sample_many(1, rng)[0])
+
+    def draw(self, rng=None):
+        """(hands, board, equity) of one matching scenario, as ScenarioBank.scenario"""
+        return self.index.bank.scenario(self.sample(rng))
+
+
+class ScenarioIndex:
+    """Secondary indexes over a scenario bank for drilling specific spots
+
+    Rows are grouped into buckets by player count, street, board texture,
+    equity spread and the made-hand classes of the leader and runner-up, and
+    stored sorted by bucket. A query only touches bucket offsets, so
+    sampling never rescans the bank. The index is saved next to the bank
+    and extended with rows appended since it was built; it is rebuilt if
+    the bank's header and first record no longer match the ones indexed.
+    """
+
+    def __init__(self, bank, path=None):
+        self.bank = bank
+        self.path = path or bank.path + '.idx.npz'
+        self.queries = {}
+
+        # A regenerated bank can be as long as the old one, so its opening
+        # bytes identify it
+        fingerprint = np.fromfile(bank.path, dtype=np.uint8, count=HEADER.itemsize + RECORD.itemsize)
+        keys = np.empty(0, dtype=np.uint32)
+        current = False
+        if os.path.exists(self.path):
+            with np.load(self.path) as stored:
+                if ('fingerprint' in stored.files and np.array_equal(stored['fingerprint'], fingerprint)
+                        and len(stored['keys']) <= len(bank)):
+                    keys, self.order, self.offsets = stored['keys'], stored['order'], stored['offsets']
+                    current = True
+        if not current or len(keys) < len(bank):
+            new = [bucket_keys(bank.records[start:min(start + FEATURE_CHUNK, len(bank))])
+                   for start in range(len(keys), len(bank), FEATURE_CHUNK)]
+            keys = np.concatenate([keys] + new)
+            self.order = np.argsort(keys, kind='stable').astype(np.uint32)
+            self.offsets = np.concatenate([[0], np.bincount(keys, minlength=BUCKETS).cumsum()])
+            np.savez(self.path, keys=keys, order=self.order, offsets=self.offsets, fingerprint=fingerprint)
+        self.keys = keys
+
+    def query(self, players=None, street=None, min_spread=0, max_spread=100, paired=None, monotone=None,
+              connected=None, leader_class=None, runner_up_class=None):
+        """Scenarios matching every given filter; None leaves a dimension open
+
+        players, street ('flop', 'turn', 'river') and the hand classes (treys
+        names such as 'Pair' or numbers 1-9) take one value or several.
+        Spread bounds are in percentage points and widen to 5-point buckets.
+        """
+        args = (players, street, min_spread, max_spread, paired, monotone, connected, leader_class, runner_up_class)
+        cache_key = repr(args)
+        if cache_key not in self.queries:
+            self.queries[cache_key] = ScenarioQuery(self, self._buckets(*args))
+        return self.queries[cache_key]
+
+    def _buckets(self, players, street, min_spread, max_spread, paired, monotone, connected,
+                 leader_class, runner_up_class):
+        textures = [
+            texture for texture in range(8)
+            if all(wanted is None or bool(texture & bit) == wanted
+                   for bit, wanted in ((PAIRED, paired), (MONOTONE, monotone), (CONNECTED, connected)))
+        ]
+        spreads = range(int(min_spread // SPREAD_STEP), max(int(-(-max_spread // SPREAD_STEP)), 1))
+        classes = list(range(1, 10))
+        matchups = [leader * 9 + runner
+                    for leader in _choices(_class_numbers(leader_class), classes)
+                    for runner in _choices(_class_numbers(runner_up_class), classes)]
+
+        grids = np.ix_(_choices(players, list(range(2, 11))), _choices(street, list(STREETS)), textures,
+                       [spread for spread in spreads if spread < SPREAD_BUCKETS], matchups)
+        key = grids[0]
+        for size, grid in zip(DIMENSIONS[1:], grids[1:]):
+            key = key * size + np.asarray(grid)
+        return key.ravel()
+
+
+def main(argv=None):
+    path = argv[0] if argv else None
+    bank = ScenarioBank(path) if path else ScenarioBank()
+    started = time.perf_counter()
+    index = ScenarioIndex(bank)
+    print(f"Indexed {len(bank):,} scenarios in {time.perf_counter() - started:.2f}s")
+
+    query = index.query(players=3, street='turn', max_spread=20, monotone=True)
+    print(f"{len(query):,} close 3-way turn spots on monotone boards")
+    if len(query):
+        started = time.perf_counter()
+        for _ in range(1000):
+            query.sample()
+        print(f"  {(time.perf_counter() - started):.3f} ms per sample")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,158 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import equity
+from cards import CARD_INTS
+from game import shared_evaluator
+
+BANK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scenarios.bin')
+
+# File layout: a header, then fixed-size records appended in generation
+# order, so scenario i always sits at HEADER.itemsize + i * RECORD.itemsize.
+# Cards are dense indices (NO_CARD for empty seats and board slots) and
+# equities uint16 fractions of SCALE, as in the preflop table.
+MAGIC = b'EKSB'
+VERSION = 1
+HEADER = np.dtype([('magic', 'S4'), ('version', '<u4')])
+RECORD = np.dtype([
+    ('players', 'u1'),
+    ('board_size', 'u1'),
+    ('hands', 'u1', (10, 2)),
+    ('board', 'u1', (5,)),
+    ('equity', '<u2', (10,)),
+    ('pad', 'u1'),
+])
+NO_CARD = 255
+SCALE = 65534
+
+STREET_NAMES = {3: 'Flop', 4: 'Turn', 5: 'River'}
+
+# Scenarios generated by one worker task; shards do not depend on the pool
+# size, so a seed gives the same bank for any number of workers
+GENERATION_SHARD = 2000
+
+
+def _generate_shard(count, entropy, shard, min_players, max_players):
+    """Worker task: `count` random flop, turn or river spots with exact equities"""
+    rng = np.random.default_rng(np.random.SeedSequence(entropy, spawn_key=(shard,)))
+    evaluator = shared_evaluator()
+    records = np.zeros(count, dtype=RECORD)
+    records['hands'] = NO_CARD
+    records['board'] = NO_CARD
+    for i in range(count):
+        players = int(rng.integers(min_players, max_players + 1))
+        board_size = int(rng.integers(3, 6))
+        cards = rng.permutation(52)[:2 * players + board_size]
+        hands = cards[:2 * players].reshape(players, 2)
+        board = cards[2 * players:]
+
+        shares, pots = equity.enumerate_shares(
+            evaluator, [[CARD_INTS[card] for card in hand] for hand in hands], [CARD_INTS[card] for card in board])
+        records['players'][i] = players
+        records['board_size'][i] = board_size
+        records['hands'][i, :players] = hands
+        records['board'][i, :board_size] = board
+        records['equity'][i, :players] = np.rint(np.array(shares) / (pots * equity.POT_UNITS) * SCALE)
+    return records
+
+
+def append_records(path, records):
+    """Append records to the bank at path, creating it if needed"""
+    if not os.path.exists(path):
+        with open(path, 'wb') as f:
+            f.write(np.array([(MAGIC, VERSION)], dtype=HEADER).tobytes())
+    else:
+        # Drop a partial record left by an interrupted append
+        size = os.path.getsize(path) - HEADER.itemsize
+        if size % RECORD.itemsize:
+            os.truncate(path, os.path.getsize(path) - size % RECORD.itemsize)
+    with open(path, 'ab') as f:
+        f.write(records.tobytes())
+
+
+def generate(count, path=BANK_PATH, workers=None, seed=None, min_players=2, max_players=10):
+    """Generate `count` scenarios in parallel and append them to the bank"""
+    started = time.perf_counter()
+    entropy = np.random.SeedSequence(seed).entropy
+    shards = range(0, count, GENERATION_SHARD)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_generate_shard, min(GENERATION_SHARD, count - start), entropy, shard,
+                        min_players, max_players)
+            for shard, start in enumerate(shards)
+        ]
+        done = 0
+        for future in futures:
+            records = future.result()
+            append_records(path, records)
+            done += len(records)
+            print(f"  {done:,}/{count:,} scenarios", end='\r')
+    print()
+    print(f"Appended {count:,} scenarios to {path} in {time.perf_counter() - started:.1f}s")
+
+
+class ScenarioBank:
+    """Memory-mapped bank of quiz positions with their exact equities"""
+
+    def __init__(self, path=BANK_PATH):
+        header = np.fromfile(path, dtype=HEADER, count=1)
+        if len(header) != 1 or header[0]['magic'] != MAGIC or header[0]['version'] != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} scenario bank")
+        self.path = path
+        count = (os.path.getsize(path) - HEADER.itemsize) // RECORD.itemsize
+        self.records = np.memmap(path, dtype=RECORD, mode='r', offset=HEADER.itemsize, shape=(count,))
+
+    def __len__(self):
+        return len(self.records)
+
+    def scenario(self, index):
+        """(hands, board, equity percentages) of scenario index, cards as treys ints"""
+        record = self.records[index]
+        players, board_size = int(record['players']), int(record['board_size'])
+        hands = [[CARD_INTS[card] for card in hand] for hand in record['hands'][:players]]
+        board = [CARD_INTS[card] for card in record['board'][:board_size]]
+        return hands, board, (record['equity'][:players] / SCALE * 100).tolist()
+
+    def draw(self, rng=None):
+        """A uniformly random scenario, as returned by scenario()"""
+        rng = rng or np.random.default_rng()
+        return self.scenario(int(rng.integers(len(self.records))))
+
+
+def load_bank(path=BANK_PATH):
+    """The scenario bank at path, or None if it has not been generated"""
+    if not os.path.exists(path):
+        return None
+    return ScenarioBank(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate or inspect the quiz scenario bank")
+    parser.add_argument('command', choices=['generate', 'info'])
+    parser.add_argument('--output', default=BANK_PATH, help="bank file path")
+    parser.add_argument('--count', type=int, default=100000, help="scenarios to append")
+    parser.add_argument('--min-players', type=int, default=2)
+    parser.add_argument('--max-players', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--seed', type=int, default=None, help="master seed for reproducible scenarios")
+    args = parser.parse_args(argv)
+
+    if args.command == 'generate':
+        if not 2 <= args.min_players <= args.max_players <= 10:
+            parser.error("players must satisfy 2 <= min <= max <= 10")
+        generate(args.count, args.output, args.workers, args.seed, args.min_players, args.max_players)
+
+    bank = ScenarioBank(args.output)
+    print(f"{len(bank):,} scenarios in {bank.path}")
+    for size, name in STREET_NAMES.items():
+        print(f"  {name}: {int((bank.records['board_size'] == size).sum()):,}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+import argparse
+import asyncio
+import json
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from treys import Card
+
+import equity
+import equity_cache
+from game import PokerHand, guess_accuracy
+from parallel import init_worker, solve_spot
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# Equity jobs one table may have outstanding. A table that reaches the limit
+# stops reading commands until a job finishes, so TCP pushes back on it
+# without slowing the other tables.
+MAX_PENDING = 2
+
+
+class EquityService:
+    """Equity worker pool shared by every table
+
+    Spots are keyed on their suit-canonical form: cached spots are answered
+    at once, and tables asking for a spot that is already being computed
+    wait on the same job instead of submitting another.
+    """
+
+    def __init__(self, workers=None, cache=None):
+        self.pool = ProcessPoolExecutor(max_workers=workers, initializer=init_worker)
+        self.cache = cache or equity_cache.shared_cache
+        self.inflight = {}
+        self.requests = 0
+        self.coalesced = 0
+        self.computed = 0
+
+    def close(self):
+        """Shut the worker processes down"""
+        self.pool.shutdown()
+
+    async def solve(self, hands, board):
+        """EquityResult for the hands (in seat order) on board"""
+        self.requests += 1
+        if len(hands) < 2:
+            return equity.exact_result([equity.POT_UNITS] * len(hands), 1)
+
+        key = self.cache.situation_key(hands, board)
+        result = self.cache.get(key)
+        if result is not None:
+            return result
+
+        job = self.inflight.get(key)
+        if job is None:
+            self.computed += 1
+            job = asyncio.get_running_loop().run_in_executor(self.pool, solve_spot, hands, board)
+            self.inflight[key] = job
+            job.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.coalesced += 1
+        # Shielded so that one table giving up does not cancel the shared job
+        return equity.EquityResult.from_dict(await asyncio.shield(job))
+
+    def _finish(self, key, job):
+        del self.inflight[key]
+        if not job.cancelled() and job.exception() is None:
+            result = equity.EquityResult.from_dict(job.result())
+            # A run stopped by the time budget is not kept as a settled answer
+            if result.interval_width() <= equity.DEFAULT_TOLERANCE:
+                self.cache.put(key, result)
+
+    def stats(self):
+        """Request, coalescing and cache counters"""
+        return {
+            'requests': self.requests,
+            'coalesced': self.coalesced,
+            'computed': self.computed,
+            'in_flight': len(self.inflight),
+            'cache': self.cache.stats(),
+        }
+
+
+def score_guesses(guesses, true_equity):
+    """Average guess_accuracy over the seats in true_equity, as in PokerGame.show_results"""
+    total = sum(guess_accuracy(guesses.get(seat, 0), true) for seat, true in true_equity.items())
+    return total / len(true_equity) if true_equity else 0.0
+
+
+class Table:
+    """One client connection playing hands on its own PokerHand
+
+    Commands and replies are JSON lines. Commands: {"op": "new_hand",
+    "players": n}, {"op": "deal"}, {"op": "fold", "seats": [...]},
+    {"op": "guess", "guesses": {"seat": pct}}, {"op": "showdown"} and
+    {"op": "stats"}. Game events are forwarded as {"event": ...} lines and
+    a guess is answered with an "equity" line holding the true equity.
+    """
+
+    def __init__(self, service, reader, writer):
+        self.service = service
+        self.reader = reader
+        self.writer = writer
+        self.game = PokerHand()
+        self.game.subscribe(self.on_event)
+        self.pending = asyncio.Semaphore(MAX_PENDING)
+        self.equity_job = None  # (spot, seats, task)
+
+    def send(self, message):
+        self.writer.write(json.dumps(message).encode() + b'\n')
+
+    def on_event(self, event, data):
+        """Forward a game event to the client"""
+        message = {'event': event}
+        for name, value in data.items():
+            if name == 'card':
+                value = Card.int_to_str(value)
+            elif event == 'equity_ready':
+                continue
+            message[name] = value
+        self.send(message)
+
+    def _spot(self):
+        return tuple(self.game.community_cards), frozenset(self.game.folded_players)
+
+    async def start_equity(self):
+        """Submit equity for the current spot, waiting if too many are outstanding"""
+        await self.pending.acquire()
+        seats = self.game.active_players()
+        hands = [self.game.player_cards[seat] for seat in seats]
+        task = asyncio.ensure_future(self.service.solve(hands, list(self.game.community_cards)))
+        task.add_done_callback(lambda _: self.pending.release())
+        self.equity_job = (self._spot(), seats, task)
+
+    async def handle(self, command):
+        """Apply one command to the table"""
+        op = command.get('op')
+        game = self.game
+        if op == 'new_hand':
+            players = int(command.get('players', 2))
+            if not 2 <= players <= 10:
+                raise ValueError("players must be between 2 and 10")
+            self.equity_job = None
+            game.new_hand(players)
+            game.deal_cards()
+        elif op == 'deal':
+            if not game.player_cards or len(game.community_cards) == 5:
+                raise ValueError("nothing left to deal")
+            game.deal_street()
+            # Equity starts now, while the player is still thinking
+            await self.start_equity()
+        elif op == 'fold':
+            if game.fold([int(seat) for seat in command.get('seats', [])]) and game.community_cards:
+                await self.start_equity()
+        elif op == 'guess':
+            if len(game.community_cards) < 3:
+                raise ValueError("guesses start on the flop")
+            if self.equity_job is None or self.equity_job[0] != self._spot():
+                await self.start_equity()
+            _, seats, task = self.equity_job
+            result = await task
+            true_equity = dict(zip(seats, result.equity))
+            guesses = {int(seat): float(value) for seat, value in command.get('guesses', {}).items()}
+            self.send({
+                'event': 'equity',
+                'street': game.street,
+                'equity': {str(seat): value for seat, value in true_equity.items()},
+                'exact': result.exact,
+                'accuracy': score_guesses(guesses, true_equity),
+            })
+        elif op == 'showdown':
+            game.showdown()
+        elif op == 'stats':
+            self.send({'event': 'stats', **self.service.stats()})
+        else:
+            raise ValueError(f"unknown op {op!r}")
+
+    async def run(self):
+        """Serve commands until the client disconnects"""
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                try:
+                    await self.handle(json.loads(line))
+                except (ValueError, TypeError, AttributeError, IndexError) as error:
+                    self.send({'event': 'error', 'message': str(error)})
+                # Slow readers hold up only their own table
+                await self.writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.writer.close()
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=None):
+    """Run the game server until cancelled"""
+    service = EquityService(workers)
+    server = await asyncio.start_server(
+        lambda reader, writer: Table(service, reader, writer).run(), host, port)
+    print(f"Serving poker equity tables on {host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Host the equity-guessing game for many tables over TCP")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=None, help="equity worker processes (default: all cores)")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
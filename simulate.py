@@ -0,0 +1,157 @@
+import argparse
+import json
+import random
+import sys
+import time
+
+from treys import Card
+
+from game import STREETS, PokerHand
+
+# Players get a chance to fold after these streets, as in PokerGame.play_game
+FOLD_STREETS = ('flop', 'turn')
+
+
+def never_fold(game, street):
+    """Fold policy that keeps every player in to the showdown"""
+    return ()
+
+
+class RandomFolds:
+    """Fold policy that folds each active player with a fixed probability"""
+
+    def __init__(self, probability=0.2):
+        self.probability = probability
+
+    def __call__(self, game, street):
+        return [seat for seat in game.active_players() if game.rng.random() < self.probability]
+
+
+class WeakHandFolds:
+    """Fold policy that folds players whose made hand is in a weaker class
+
+    Classes follow treys: 1 = straight flush ... 8 = pair, 9 = high card.
+    """
+
+    def __init__(self, weakest_class=8):
+        self.weakest_class = weakest_class
+
+    def __call__(self, game, street):
+        active = game.active_players()
+        hands = [game.player_cards[seat] for seat in active]
+        ranks = game.evaluator.evaluate_hands(hands, game.community_cards)
+        return [seat for seat, rank in zip(active, ranks)
+                if game.evaluator.get_rank_class(rank) > self.weakest_class]
+
+
+FOLD_POLICIES = {
+    'never': never_fold,
+    'random': RandomFolds(),
+    'weak': WeakHandFolds(),
+}
+
+
+def play_hand(game, fold_policy=never_fold):
+    """Play one complete hand on a PokerHand with no I/O; returns its record
+
+    Dealing follows PokerGame: two rounds of hole cards, then a burn before
+    the flop, turn and river. After the flop and turn the fold policy is
+    called as policy(game, street) and returns the seats to fold. The last
+    active seat never folds, so every hand has a winner: if the policy
+    names every active seat, one of them, drawn with game.rng, stays in.
+    """
+    game.new_hand()
+    game.deal_cards()
+    folds = {}
+    for street, _ in STREETS:
+        game.deal_street()
+        active = game.active_players()
+        if street in FOLD_STREETS and len(active) > 1:
+            seats = [seat for seat in dict.fromkeys(fold_policy(game, street)) if seat in active]
+            if len(seats) == len(active):
+                seats.remove(game.rng.choice(seats))
+            folded = game.fold(seats)
+            if folded:
+                folds[street] = sorted(folded)
+    winners, rank = game.showdown()
+    return {
+        'players': game.player_cards,
+        'board': game.community_cards,
+        'folds': folds,
+        'winners': winners,
+        'rank': rank,
+    }
+
+
+def format_record(record):
+    """JSON line for a hand record with cards written as treys strings"""
+    text = dict(record)
+    text['players'] = [[Card.int_to_str(card) for card in hand] for hand in record['players']]
+    text['board'] = [Card.int_to_str(card) for card in record['board']]
+    return json.dumps(text)
+
+
+def simulate(hands, players, fold_policy=never_fold, seed=None, log=None):
+    """Play `hands` hands headlessly and return summary statistics
+
+    When log is a writable file every hand is written to it as a JSON line.
+    """
+    if not 2 <= players <= 10:
+        raise ValueError("players must be between 2 and 10")
+    game = PokerHand(players, rng=random.Random(seed))
+    wins = [0] * players
+    ties = 0
+    classes = {}
+    started = time.perf_counter()
+    for number in range(1, hands + 1):
+        record = {'hand': number, **play_hand(game, fold_policy)}
+        if not record['winners']:
+            raise RuntimeError(f"Hand {number} ended without a winner")
+        if len(record['winners']) > 1:
+            ties += 1
+        for winner in record['winners']:
+            wins[winner] += 1
+        if record['rank'] is not None:
+            name = game.evaluator.class_to_string(game.evaluator.get_rank_class(record['rank']))
+            classes[name] = classes.get(name, 0) + 1
+        if log is not None:
+            log.write(format_record(record) + '\n')
+    elapsed = time.perf_counter() - started
+    return {
+        'hands': hands,
+        'seconds': elapsed,
+        'hands_per_minute': hands / elapsed * 60 if elapsed > 0 else 0.0,
+        'wins': wins,
+        'ties': ties,
+        'winning_classes': classes,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play poker hands headlessly for regression and analytics")
+    parser.add_argument('--hands', type=int, default=100000, help="hands to play")
+    parser.add_argument('--players', type=int, default=6, help="players per hand (2-10)")
+    parser.add_argument('--policy', choices=sorted(FOLD_POLICIES), default='never', help="fold policy")
+    parser.add_argument('--seed', type=int, default=None, help="seed for reproducible hands")
+    parser.add_argument('--log', default=None, help="write every hand to this file as JSON lines")
+    args = parser.parse_args(argv)
+
+    log = open(args.log, 'w') if args.log else None
+    try:
+        summary = simulate(args.hands, args.players, FOLD_POLICIES[args.policy], args.seed, log)
+    finally:
+        if log is not None:
+            log.close()
+
+    print(f"Played {summary['hands']:,} hands in {summary['seconds']:.1f}s "
+          f"({summary['hands_per_minute']:,.0f} hands/minute)")
+    for seat, count in enumerate(summary['wins']):
+        print(f"  Player {seat + 1}: {count:,} wins")
+    print(f"  Split pots: {summary['ties']:,}")
+    for name, count in sorted(summary['winning_classes'].items(), key=lambda item: -item[1]):
+        print(f"  {name}: {count:,}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())